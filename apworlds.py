@@ -5,8 +5,13 @@
 from collections.abc import Iterable
 import csv
 import dataclasses
+import hashlib
 import logging
+import marshal
+import os
+import pathlib
 import re
+from typing import Optional
 
 
 log = logging.getLogger(__name__)
@@ -41,6 +46,116 @@ def __init__(self):
         self.entries: list[DatabaseEntry] = []
         self.from_file_name: dict[str, DatabaseEntry] = {}
         self.from_game_name: dict[str, DatabaseEntry] = {}
+        # Secondary indexes, kept up to date by insert
+        self.from_file_name_casefold: dict[str, DatabaseEntry] = {}
+        self.from_game_name_casefold: dict[str, DatabaseEntry] = {}
+        self.from_unversioned_file_name: dict[str, DatabaseEntry] = {}
+        self.keep_games: set[str] = set()
+
+    @classmethod
+    def from_files(cls, file_paths: Iterable,
+                   snapshot_path=None) -> 'Database':
+        """
+        Load and merge the specified CSV files. If snapshot_path is given,
+        use the compiled snapshot there if it was made from the same files,
+        otherwise (re)create it.
+        """
+        file_paths = [pathlib.Path(file_path) for file_path in file_paths]
+        if snapshot_path is not None:
+            db = cls.load_snapshot(snapshot_path, file_paths)
+            if db is not None:
+                return db
+        db = cls()
+        for file_path in file_paths:
+            db.insert_file(file_path)
+        if snapshot_path is not None:
+            db.save_snapshot(snapshot_path, file_paths)
+        return db
+
+    def save_snapshot(self, snapshot_path, file_paths: Iterable) -> None:
+        """Save the merged entries for load_snapshot"""
+        entry_indexes = {id(entry): i for i, entry in enumerate(self.entries)}
+        # Flat lists load a lot faster than lots of small containers
+        data = {
+            'version': _snapshot_version,
+            'sources': [_source_stamp(pathlib.Path(file_path), True)
+                        for file_path in file_paths],
+            'file_names': [entry.file_name for entry in self.entries],
+            'keep': [entry.keep for entry in self.entries],
+            'game_names': [entry.game_name for entry in self.entries],
+            # Only extra columns, the others are in the entry already
+            'other': {i: other
+                      for i, other in enumerate(
+                          {key: value
+                           for key, value in entry._other.items()
+                           if key not in ('name', 'keep', 'game')}
+                          for entry in self.entries)
+                      if other},
+            # Indexes refer to entries by their position
+            'indexes': {name: (list(getattr(self, name).keys()),
+                               [entry_indexes[id(entry)]
+                                for entry in getattr(self, name).values()])
+                        for name in _snapshot_indexes},
+            'keep_games': list(self.keep_games),
+        }
+        snapshot_path = pathlib.Path(snapshot_path)
+        tmp_path = snapshot_path.with_name(snapshot_path.name + '.tmp')
+        try:
+            with open(tmp_path, 'wb') as f:
+                marshal.dump(data, f)
+            os.replace(tmp_path, snapshot_path)
+        except OSError:
+            log.warning("Failed to write database snapshot %s", snapshot_path,
+                        exc_info=True)
+
+    @classmethod
+    def load_snapshot(cls, snapshot_path,
+                      file_paths: Iterable) -> Optional['Database']:
+        """
+        Load a snapshot made by save_snapshot. Returns None if there is
+        none, or if the CSV files changed since then. Files are compared
+        by size and modification time, and by hash if only the time changed.
+        """
+        try:
+            with open(snapshot_path, 'rb') as f:
+                data = marshal.loads(f.read())
+            if data['version'] != _snapshot_version:
+                return None
+            sources = data['sources']
+            file_paths = [pathlib.Path(file_path) for file_path in file_paths]
+            if len(sources) != len(file_paths):
+                return None
+            touched = False
+            for source, file_path in zip(sources, file_paths):
+                stamp = _source_stamp(file_path, False)
+                if source[:3] == stamp[:3]:
+                    continue
+                if source[:2] != stamp[:2] \
+                        or source[3] != _source_stamp(file_path, True)[3]:
+                    return None
+                touched = True
+
+            db = cls()
+            entries = list(map(DatabaseEntry, data['file_names'], data['keep'],
+                               data['game_names']))
+            for i, other in data['other'].items():
+                entries[i]._other = other
+            db.entries = entries
+            for name, (keys, positions) in data['indexes'].items():
+                if name in _snapshot_indexes:
+                    setattr(db, name, dict(zip(keys, map(entries.__getitem__,
+                                                         positions))))
+            db.keep_games = set(data['keep_games'])
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, TypeError, KeyError,
+                IndexError):
+            log.debug("Ignoring unusable database snapshot %s", snapshot_path,
+                      exc_info=True)
+            return None
+        if touched:
+            db.save_snapshot(snapshot_path, file_paths)  # Update the times
+        return db
 
     def insert_file(self, file_path) -> None:
         with open(file_path, "rt", encoding='utf-8-sig', newline='\n') as f:
@@ -59,7 +174,7 @@ def insert(self, entry: DatabaseEntry) -> None:
                 other.keep |= entry.keep
                 if other.game_name == "":
                     other.game_name = entry.game_name
-                    self.from_game_name[entry.game_name] = other
+                self._index(other)
         if entry.game_name != "":
             other = self.from_game_name.get(entry.game_name)
             if other is not None:
@@ -67,20 +182,32 @@ def insert(self, entry: DatabaseEntry) -> None:
                 other.keep |= entry.keep
                 if other.file_name == "":
                     other.file_name = entry.file_name
-                    self.from_file_name[entry.file_name] = other
+                self._index(other)
         if not exists:
             self.entries.append(entry)
-            if entry.file_name != "":
-                self.from_file_name[entry.file_name] = entry
-            if entry.game_name != "":
-                self.from_game_name[entry.game_name] = entry
+            self._index(entry)
+
+    def _index(self, entry: DatabaseEntry) -> None:
+        """(Re-)add a new or changed entry to all indexes"""
+        if entry.file_name != "":
+            self.from_file_name[entry.file_name] = entry
+            self.from_file_name_casefold.setdefault(entry.file_name.casefold(),
+                                                    entry)
+            self.from_unversioned_file_name.setdefault(
+                _unversioned(entry.file_name), entry)
+        if entry.game_name != "":
+            self.from_game_name[entry.game_name] = entry
+            self.from_game_name_casefold.setdefault(entry.game_name.casefold(),
+                                                    entry)
+            if entry.keep:
+                self.keep_games.add(entry.game_name)
 
     def output(self, path):
         field_names = ["name", "keep", "game"]
         for entry in self.entries:
             for other_field_name in entry._other.keys():
                 if other_field_name not in field_names:
-                    field_names.add(other_field_name)
+                    field_names.append(other_field_name)
 
         with open(path, 'w', encoding='utf-8', newline='\n') as f:
             writer = csv.DictWriter(f, field_names)
@@ -91,14 +218,55 @@ def output(self, path):
                                         _natural_sort_key(e['game'])))
             writer.writerows(outputs)
 
-    def should_keep_game(self, game_name: str, default: bool = True) -> bool:
+    def find_by_file(self, file_name: str) -> Optional[DatabaseEntry]:
+        """
+        Look up an apworld by file name (without .apworld), ignoring case
+        and version suffixes (like manual_stable_20260319) if needed.
+        """
+        entry = self.from_file_name.get(file_name)
+        if entry is None:
+            entry = self.from_file_name_casefold.get(file_name.casefold())
+        if entry is None:
+            entry = self.from_unversioned_file_name.get(_unversioned(file_name))
+        return entry
+
+    def find_by_game(self, game_name: str) -> Optional[DatabaseEntry]:
+        """Look up a game by name, ignoring case if needed."""
         entry = self.from_game_name.get(game_name)
+        if entry is None:
+            entry = self.from_game_name_casefold.get(game_name.casefold())
+        return entry
+
+    def game_for_file(self, file_name: str) -> Optional[str]:
+        entry = self.find_by_file(file_name)
+        return entry.game_name if entry is not None else None
+
+    def should_keep_game(self, game_name: str, default: bool = True) -> bool:
+        entry = self.find_by_game(game_name)
         return entry.keep if entry is not None else default
 
-    def should_keep_file(self, file_name: str) -> bool:
-        entry = self.from_file_name.get(file_name)
+    def should_keep_file(self, file_name: str, default: bool = False) -> bool:
+        entry = self.find_by_file(file_name)
         return entry.keep if entry is not None else default
 
+
+_snapshot_version = 2
+_snapshot_indexes = ('from_file_name', 'from_game_name',
+                     'from_file_name_casefold', 'from_game_name_casefold',
+                     'from_unversioned_file_name')
+def _source_stamp(file_path: pathlib.Path, with_hash: bool) -> tuple:
+    st = file_path.stat()
+    digest = None
+    if with_hash:
+        with open(file_path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+    return (str(file_path.absolute()), st.st_size, st.st_mtime_ns, digest)
+
+
+_version_suffix_re = re.compile(r'[_-](?:v?\d+(?:\.\d+)+|\d{6,})$')
+def _unversioned(file_name: str) -> str:
+    return _version_suffix_re.sub('', file_name.casefold())
+
 _find_number_re = re.compile(r'(\d+)')
 def _natural_sort_key(name: str):
     return tuple(int(sub) if sub.isdigit() else sub
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: CC0-1.0
+
+# Builds synthetic multiworld files with the same shape as the ones
+# Archipelago generates and times how long the steps of parsing them take,
+# since real multiworlds can't be put into the repository.
+
+import argparse
+import contextlib
+import enum
+import gc
+import io
+import json
+import logging
+import pathlib
+import pickle
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+import zipfile
+import zlib
+from typing import Any, Callable, Iterator, NamedTuple
+
+import multiworld
+import unpickle
+
+
+log = logging.getLogger(__name__)
+format_version = 3
+
+
+@contextlib.contextmanager
+def _fake_netutils() -> Iterator[types.ModuleType]:
+    """
+    A stand-in for Archipelago's NetUtils module, so pickle refers to the
+    same globals real multiworlds do.
+    """
+    module = types.ModuleType('NetUtils')
+
+    class SlotType(enum.IntFlag):
+        spectator = 0b00
+        player = 0b01
+        group = 0b10
+
+    class NetworkSlot(NamedTuple):
+        name: str
+        game: str
+        type: SlotType
+        group_members: frozenset = frozenset()
+
+    class HintStatus(enum.IntEnum):
+        HINT_UNSPECIFIED = 0
+        HINT_NO_PRIORITY = 10
+        HINT_AVOID = 20
+        HINT_PRIORITY = 30
+        HINT_FOUND = 40
+
+    class Hint(NamedTuple):
+        receiving_player: int
+        finding_player: int
+        location: int
+        item: int
+        found: bool
+        entrance: str = ""
+        item_flags: int = 0
+        status: HintStatus = HintStatus.HINT_UNSPECIFIED
+
+    for cls in (SlotType, NetworkSlot, HintStatus, Hint):
+        cls.__module__ = module.__name__
+        cls.__qualname__ = cls.__name__
+        setattr(module, cls.__name__, cls)
+
+    previous = sys.modules.get(module.__name__)
+    sys.modules[module.__name__] = module
+    try:
+        yield module
+    finally:
+        if previous is None:
+            del sys.modules[module.__name__]
+        else:
+            sys.modules[module.__name__] = previous
+
+
+def make_multidata(players: int = 100, locations: int = 200,
+                   games: int = 20, items: int = 500, hints: int = 10,
+                   spheres: int = 30, seed: int = 0) -> bytes:
+    """The contents of a synthetic .archipelago file"""
+    rng = random.Random(seed)
+    game_names = [f"Game {i}" for i in range(games)]
+    player_games = {player: rng.choice(game_names)
+                    for player in range(1, players + 1)}
+    location_ids = {game: range(1000, 1000 + max(locations * 2, 1))
+                    for game in game_names}
+
+    with _fake_netutils() as netutils:
+        player_locations = {
+            player: {location_id: (rng.randrange(1000, 1000 + items),
+                                   rng.randrange(1, players + 1),
+                                   rng.choice((0, 0, 1, 2, 4, 9)))
+                     for location_id in rng.sample(location_ids[game],
+                                                   locations)}
+            for player, game in player_games.items()
+        }
+        sphere_locations = [dict() for _ in range(spheres)]
+        for player, placed in player_locations.items():
+            for location_id in placed:
+                sphere_locations[rng.randrange(spheres)] \
+                    .setdefault(player, set()).add(location_id)
+
+        data = {
+            'slot_data': {player: {'seed': rng.randrange(1 << 32),
+                                   'goal': rng.randrange(4),
+                                   'options': list(range(10))}
+                          for player in player_games},
+            'slot_info': {player: netutils.NetworkSlot(
+                f"Player{player}", game, netutils.SlotType.player)
+                for player, game in player_games.items()},
+            'connect_names': {f"Player{player}": (0, player)
+                              for player in player_games},
+            'locations': player_locations,
+            'checks_in_area': {player: {'Total Checks': list(placed)}
+                               for player, placed in player_locations.items()},
+            'server_options': {'host': None, 'port': 38281,
+                               'password': None, 'server_password': None,
+                               'hint_cost': 10, 'release_mode': 'auto'},
+            'er_hint_data': {player: {} for player in player_games},
+            'precollected_items': {player: [] for player in player_games},
+            'precollected_hints': {player: {netutils.Hint(
+                player, rng.randrange(1, players + 1),
+                rng.randrange(1000, 1000 + locations),
+                rng.randrange(1000, 1000 + items), False,
+                status=netutils.HintStatus.HINT_PRIORITY)
+                for _ in range(hints)}
+                for player in player_games},
+            'version': (0, 6, 1),
+            'tags': ['AP'],
+            'minimum_versions': {'server': (0, 5, 0), 'clients': {}},
+            'seed_name': f"{seed:020d}",
+            'spheres': sphere_locations,
+            'datapackage': {game: {
+                'item_name_to_id': {f"{game} Item {i}": 1000 + i
+                                    for i in range(items)},
+                'location_name_to_id': {f"{game} Location {location_id}":
+                                        location_id
+                                        for location_id in location_ids[game]},
+                'checksum': f"{zlib.crc32(game.encode()):08x}",
+            } for game in game_names},
+            'race_mode': 0,
+        }
+        pickled = pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+    return bytes((format_version,)) + zlib.compress(pickled, 9)
+
+
+def make_zip(archipelago: bytes, seed_name: str = "0",
+             patches: int = 0, patch_size: int = 0) -> bytes:
+    """An output zip with the multiworld and some random patch files"""
+    rng = random.Random(patches)
+    f = io.BytesIO()
+    with zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for i in range(patches):
+            zip_file.writestr(f"AP_{seed_name}_P{i + 1}.apbin",
+                              rng.randbytes(patch_size))
+        zip_file.writestr(f"AP_{seed_name}.archipelago", archipelago)
+    return f.getvalue()
+
+
+def _inflate(path: pathlib.Path) -> None:
+    with contextlib.ExitStack() as stack:
+        inner_file = multiworld._open_multiworld(path, stack)
+        while inner_file.read(1024 * 1024):
+            pass
+
+
+def _unpickle(path: pathlib.Path) -> Any:
+    with contextlib.ExitStack() as stack:
+        return unpickle.Unpickler(
+            multiworld._open_multiworld(path, stack)).load()
+
+
+def _open(path: pathlib.Path) -> None:
+    with contextlib.ExitStack() as stack:
+        multiworld._open_multiworld(path, stack)
+
+
+def _measure(func: Callable[[], Any], repeat: int) -> dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    # Peak memory in a separate run, tracemalloc slows everything down
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'min_seconds': min(times),
+        'mean_seconds': sum(times) / len(times),
+        'peak_bytes': peak,
+    }
+
+
+def run(path: pathlib.Path, repeat: int = 5) -> dict[str, dict[str, float]]:
+    """Time each step of parsing the multiworld file at path"""
+    unpickled = _unpickle(path)
+    steps: dict[str, Callable[[], Any]] = {
+        'open': lambda: _open(path),
+        'inflate': lambda: _inflate(path),
+        'unpickle': lambda: _unpickle(path),
+        'resolve': lambda: unpickle.resolve(unpickled,
+                                            multiworld.unpickle_mapping),
+        'load': lambda: multiworld.load(path),
+        'parse': lambda: multiworld.parse(path),
+    }
+    results = {}
+    for name, func in steps.items():
+        log.debug("Measuring %s", name)
+        results[name] = _measure(func, repeat)
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.description = "Time parsing synthetic (or real) multiworlds"
+
+    parser.add_argument("--players", type=int, default=100,
+                        help="How many players the multiworld has")
+    parser.add_argument("--locations", type=int, default=200,
+                        help="How many locations each player has")
+    parser.add_argument("--games", type=int, default=20,
+                        help="How many different games are played")
+    parser.add_argument("--items", type=int, default=500,
+                        help="How many items each game has in the datapackage")
+    parser.add_argument("--hints", type=int, default=10,
+                        help="How many precollected hints each player has")
+    parser.add_argument("--patches", type=int, default=0,
+                        help="How many patch files to put into the zip")
+    parser.add_argument("--patch-size", type=int, default=1024 * 1024,
+                        dest='patch_size',
+                        help="How big each patch file is")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed for the random parts of the multiworld")
+    parser.add_argument("--repeat", "-n", type=int, default=5,
+                        help="How often to time each step")
+    parser.add_argument("--save", type=str, default=None,
+                        help="Also save the generated zip there")
+    parser.add_argument("--world", type=str, default=None,
+                        help="Time this multiworld instead of generating one")
+
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.world is not None:
+            path = pathlib.Path(args.world)
+        else:
+            log.info("Generating multiworld")
+            archipelago = make_multidata(
+                players=args.players, locations=args.locations,
+                games=args.games, items=args.items, hints=args.hints,
+                seed=args.seed)
+            if args.save is not None:
+                path = pathlib.Path(args.save)
+            else:
+                path = pathlib.Path(tmp_dir) / "multiworld.zip"
+            path.write_bytes(make_zip(archipelago, f"{args.seed:020d}",
+                                      args.patches, args.patch_size))
+        results = {
+            'world': None if args.save is None and args.world is None
+            else str(path),
+            'size': path.stat().st_size,
+            'parameters': None if args.world is not None else {
+                name: getattr(args, name)
+                for name in ('players', 'locations', 'games', 'items',
+                             'hints', 'patches', 'patch_size', 'seed')},
+            'repeat': args.repeat,
+            'steps': run(path, args.repeat),
+        }
+    json.dump(results, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+    sys.exit(main())
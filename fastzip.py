@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: CC0-1.0
+
+# Reads a few known members out of a zip file without parsing the whole
+# central directory like zipfile does. Some apworlds ship thousands of
+# files, but we only ever want one or two small JSON files out of them.
+
+import logging
+import mmap
+import struct
+import sys
+import zipfile
+import zlib
+from collections.abc import Iterable
+
+
+log = logging.getLogger(__name__)
+
+_eocd = struct.Struct('<4s4H2LH')
+_eocd_signature = b'PK\x05\x06'
+_zip64_locator = struct.Struct('<4sLQL')
+_zip64_locator_signature = b'PK\x06\x07'
+_zip64_eocd = struct.Struct('<4sQ2H2L4Q')
+_zip64_eocd_signature = b'PK\x06\x06'
+_central_header = struct.Struct('<4s4B4HL2L5H2L')
+_central_header_signature = b'PK\x01\x02'
+_local_header = struct.Struct('<4s2B4HL2L2H')
+_local_header_signature = b'PK\x03\x04'
+_max_comment = 0xFFFF
+
+
+class UnsupportedZip(Exception):
+    """The zip uses something we don't handle, use zipfile instead"""
+
+
+def _find_central_directory(mm) -> tuple[int, int]:
+    """Returns the start and end offset of the central directory."""
+    eocd_pos = mm.rfind(_eocd_signature,
+                        max(0, len(mm) - _eocd.size - _max_comment))
+    if eocd_pos < 0 or eocd_pos + _eocd.size > len(mm):
+        raise zipfile.BadZipFile("File is not a zip file")
+    (_, disk, cd_disk, _, _, cd_size, cd_offset, _) \
+        = _eocd.unpack_from(mm, eocd_pos)
+    if disk != 0 or cd_disk != 0:
+        raise UnsupportedZip("Multi-disk zip files are not supported")
+
+    if cd_offset == 0xFFFFFFFF or cd_size == 0xFFFFFFFF:
+        locator_pos = eocd_pos - _zip64_locator.size
+        if locator_pos < 0 or mm[locator_pos:locator_pos + 4] \
+                != _zip64_locator_signature:
+            raise zipfile.BadZipFile("Missing zip64 end of central directory locator")
+        _, _, zip64_eocd_pos, _ = _zip64_locator.unpack_from(mm, locator_pos)
+        if mm[zip64_eocd_pos:zip64_eocd_pos + 4] != _zip64_eocd_signature:
+            raise zipfile.BadZipFile("Missing zip64 end of central directory")
+        (_, _, _, _, _, _, _, _, cd_size, cd_offset) \
+            = _zip64_eocd.unpack_from(mm, zip64_eocd_pos)
+
+    if cd_offset + cd_size > len(mm):
+        raise zipfile.BadZipFile("Central directory is out of bounds")
+    if cd_size > 0 and mm[cd_offset:cd_offset + 4] != _central_header_signature:
+        # Probably something was prepended to the zip (e.g. self-extractors)
+        raise UnsupportedZip("Central directory is not where it should be")
+    return cd_offset, cd_offset + cd_size
+
+
+def _zip64_extra(extra: bytes, size: int, compressed_size: int,
+                 offset: int) -> tuple[int, int, int]:
+    pos = 0
+    while pos + 4 <= len(extra):
+        tag, length = struct.unpack_from('<2H', extra, pos)
+        pos += 4
+        if tag == 0x0001:
+            fields = extra[pos:pos + length]
+            values = list(struct.unpack_from(f'<{len(fields) // 8}Q', fields))
+            if size == 0xFFFFFFFF:
+                size = values.pop(0)
+            if compressed_size == 0xFFFFFFFF:
+                compressed_size = values.pop(0)
+            if offset == 0xFFFFFFFF:
+                offset = values.pop(0)
+            break
+        pos += length
+    return size, compressed_size, offset
+
+
+def _find_member(mm, cd_start: int, cd_end: int,
+                 name: str) -> tuple | None:
+    """
+    Scan the raw central directory for a member name and return its
+    header fields or None. Only the entry whose name matches is parsed.
+    """
+    found = None
+    for encoded_name in dict.fromkeys((name.encode('utf-8'),
+                                       name.encode('cp437', 'replace'))):
+        pos = mm.find(encoded_name, cd_start, cd_end)
+        while pos >= 0:
+            header_pos = pos - _central_header.size
+            if header_pos >= cd_start \
+                    and mm[header_pos:header_pos + 4] == _central_header_signature:
+                header = _central_header.unpack_from(mm, header_pos)
+                name_length, extra_length = header[12], header[13]
+                if name_length == len(encoded_name):
+                    # Later entries win, like in zipfile
+                    found = (header, mm[pos + name_length:
+                                        pos + name_length + extra_length])
+            pos = mm.find(encoded_name, pos + 1, cd_end)
+        if found is not None:
+            break
+    return found
+
+
+def _read_member(mm, header: tuple, extra: bytes) -> bytes:
+    flags, method, crc = header[5], header[6], header[9]
+    compressed_size, size, offset = header[10], header[11], header[18]
+    size, compressed_size, offset = _zip64_extra(extra, size,
+                                                 compressed_size, offset)
+    if flags & 0x1:
+        raise UnsupportedZip("Encrypted members are not supported")
+    if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+        raise UnsupportedZip(f"Compression method {method} is not supported")
+
+    if mm[offset:offset + 4] != _local_header_signature:
+        raise zipfile.BadZipFile("Bad magic number for file header")
+    local = _local_header.unpack_from(mm, offset)
+    data_start = offset + _local_header.size + local[10] + local[11]
+    data = mm[data_start:data_start + compressed_size]
+    if method == zipfile.ZIP_DEFLATED:
+        try:
+            data = zlib.decompress(data, -zlib.MAX_WBITS, size)
+        except zlib.error as e:
+            raise zipfile.BadZipFile(f"Failed to inflate member: {e}")
+    if len(data) != size or zlib.crc32(data) != crc:
+        raise zipfile.BadZipFile("Bad CRC-32 or size of member")
+    return data
+
+
+def read_members(path, names: Iterable[str]) -> dict[str, bytes]:
+    """
+    Read the specified members out of the zip file at path. Members that
+    don't exist are missing from the returned dict.
+    Raises zipfile.BadZipFile for broken zips and UnsupportedZip for zips
+    that should be read with zipfile instead.
+    """
+    with open(path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            raise zipfile.BadZipFile("File is not a zip file")
+        with mm:
+            cd_start, cd_end = _find_central_directory(mm)
+            members = {}
+            for name in names:
+                found = _find_member(mm, cd_start, cd_end, name)
+                if found is not None:
+                    members[name] = _read_member(mm, *found)
+            return members
+
+
+def read_members_zipfile(path, names: Iterable[str]) -> dict[str, bytes]:
+    """Same as read_members, but using zipfile"""
+    with zipfile.ZipFile(path) as zip_file:
+        namelist = set(zip_file.namelist())
+        return {name: zip_file.read(name)
+                for name in names
+                if name in namelist}
+
+
+def read_members_any(path, names: Iterable[str]) -> dict[str, bytes]:
+    """read_members, but falls back to zipfile if needed"""
+    names = list(names)
+    try:
+        return read_members(path, names)
+    except UnsupportedZip as e:
+        log.debug("Falling back to zipfile for %s: %s", path, e)
+        return read_members_zipfile(path, names)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr, level=logging.DEBUG)
+    import argparse
+    import pathlib
+    import timeit
+    parser = argparse.ArgumentParser()
+    parser.description = "Compare reading apworld manifests with zipfile"
+
+    parser.add_argument("-n", "--number", type=int, default=20,
+                        help="How often to read each apworld")
+    parser.add_argument("apworlds", type=str, nargs='+',
+                        help="Paths to .apworld files")
+
+    args = parser.parse_args()
+    totals = {read_members_zipfile: 0.0, read_members_any: 0.0}
+    for apworld in args.apworlds:
+        stem = pathlib.Path(apworld).stem
+        names = (f'{stem}/archipelago.json', 'archipelago.json',
+                 f'{stem}/data/game.json')
+        if read_members_zipfile(apworld, names) != read_members_any(apworld, names):
+            log.error("%s: Results differ", apworld)
+        for func in totals.keys():
+            totals[func] += timeit.timeit(lambda: func(apworld, names),
+                                          number=args.number)
+    for func, total in totals.items():
+        print(f"{func.__name__}: {total / args.number / len(args.apworlds) * 1e6:.1f} µs per apworld")
@@ -1,156 +1,73 @@
+#!/usr/bin/env python3
+
 # This was never meant to be seen by another pair of eyes.
 # Good luck.
+import argparse
+import location_checks
 import multiworld
-import unpickle
-import io
-import enum
+import reachability
+import sphere_tracker
+import sys
+from typing import Optional
 
 import platform
 if platform.system() == "Windows":
-    import sys  # Workaround for file redirection on Windows
-    sys.stdout.reconfigure(encoding='utf-8')
-
-# AP multidata from in the output .zip
-AP_PATH = r"/home/neui/AP/Archipelago/output/AP_63582889109049541795.zip"
-UNREACHABLE_SPHERE = 232
-# download the sphere tracker through right click -> save link as
-SPHERE_TRACKER_PATH = r"/home/neui/projects/ap-misc/sphere-tracker.html"
-
-class ItemClassification(enum.IntFlag):
-    filler = 0b00000
-    progression = 0b00001
-    useful = 0b00010
-    trap = 0b00100
-    skip_balancing = 0b01000
-    deprioritized = 0b10000
-    progression_deprioritized_skip_balancing = 0b11001
-    progression_skip_balancing = 0b01001
-    progression_deprioritized = 0b10001
+    sys.stdout.reconfigure(encoding='utf-8')  # Workaround for file redirection on Windows
+
+# These should really be events, and don't actually send on goal because the game client implementations are
+# bad.
+event_like_locations = ("Perfect Chaos Fight", "Bowser", "Yoshi's House")
+
 
 def find_unchecked_progression(
+        mw: multiworld.MultiWorld,
+        sphere_tracker_path: Optional[str] = None,
+        checked: Optional[location_checks.CheckedLocations] = None,
+        unreachable_sphere: Optional[int] = None,
         progression_only: bool = False,
         guaranteed_in_logic_only: bool = False,
         ignore_emblems_and_strawberries: bool = False,
 ) -> None:
     from collections import defaultdict
-    import zlib
-    import re
-    import html
-
-    
-
-    with open(AP_PATH, "rb") as f:
-        raw_data = f.read()
-        mw = multiworld.parse(raw_data)
-        ver, data = multiworld._get_inner(multiworld._find_multiworld(raw_data))
-        data = unpickle.Unpickler(io.BytesIO(data)).load()
-        data = unpickle.resolve(data, multiworld.unpickle_mapping)
-    # [0] is team, [1] is slot number
-    location_id_to_name = {game: {v: k for k, v in game_data["location_name_to_id"].items()}
-                           for game, game_data in data["datapackage"].items()}
-    locations: dict[int, dict[int, tuple[int, int, int]]] = data["locations"]
-    game_data_packages = data["datapackage"]
-    item_id_to_name_game_data_packages = {
-        game: {v: k for k, v in datapackage["item_name_to_id"].items()}
-        for game, datapackage
-        in game_data_packages.items()
-    }
-
-    with open(SPHERE_TRACKER_PATH, "r", encoding="utf-8") as f:
-        contents = f.read()
-
-    per_sphere_location_names: dict[int, dict[str, dict[str, int]]] = {}
-
-    player_name_to_id = {slot.player_name: player_id for player_id, slot in mw.slot_info.items()}
 
-    player_locations = defaultdict(list)
+    engine = reachability.Reachability(mw, progression_only=progression_only)
+    for player in mw.slot_info:
+        engine.mark_checked_names(player, event_like_locations)
+    if checked is not None:
+        # Straight from the server, no names involved
+        for player_id, location_ids in checked.items():
+            engine.mark_checked(player_id, location_ids)
+    if sphere_tracker_path is not None:
+        with open(sphere_tracker_path, "r", encoding="utf-8") as f:
+            for row in sphere_tracker.iter_rows(f):
+                player_id = mw.get_player_id(row.player)
+                if player_id is not None:
+                    engine.mark_checked_names(player_id, (row.location,))
+    if ignore_emblems_and_strawberries:
+        engine.ignore_items(("Emblem", "Strawberry"))
 
-    for sphere_num, per_player_locs in enumerate(data["spheres"], start=1):
-        escaped_prog_loc_names_by_escaped_player_name: dict[str, dict[str, int]] = {}
-        per_sphere_location_names[sphere_num] = escaped_prog_loc_names_by_escaped_player_name
-
-        for player, loc_ids in per_player_locs.items():
-            player_locs = locations[player]
-            if progression_only:
-                progression_loc_ids = [loc_id for loc_id in loc_ids if
-                                       ItemClassification.progression in ItemClassification(player_locs[loc_id][2])]
-            else:
-                progression_loc_ids = loc_ids
-            id_to_name = location_id_to_name[mw.slot_info[player].game_name]
-            loc_names = {id_to_name[loc_id]: loc_id for loc_id in progression_loc_ids}
-            # These should really be events, and don't actually send on goal because the game client implementations are
-            # bad.
-            if "Perfect Chaos Fight" in loc_names:
-                del loc_names["Perfect Chaos Fight"]
-            if "Bowser" in loc_names:
-                del loc_names["Bowser"]
-            if "Yoshi's House" in loc_names:
-                del loc_names["Yoshi's House"]
-            escaped_prog_loc_names_by_escaped_player_name[mw.slot_info[player].player_name] = loc_names
-
-    for match in re.finditer(
-            r"<td>(\d+)</td>\s+<td>([^<]+)</td>\n.+\n.+\n\s+<td>([^<]+)", contents):
-        sphere_num, escaped_player_name, escaped_location_name = match.groups()
-        unescaped_loc_name = html.unescape(escaped_location_name)
-        locs_dict = per_sphere_location_names[int(sphere_num)][html.unescape(escaped_player_name)]
-        if unescaped_loc_name in locs_dict:
-            del locs_dict[unescaped_loc_name]
-
-    players_missing_progression_items: set[int] = set()
+    player_locations = defaultdict(list)
 
     from collections import Counter
     reachable_counts: Counter[str] = Counter()
 
     all_player_names: set[str] = set()
 
-    per_player_locs: dict[str, dict[str, int]]
-    for sphere_num, per_player_locs in per_sphere_location_names.items():
-        missing_progression_items_after_sphere: set[int] = set()
-
-        if sphere_num == UNREACHABLE_SPHERE:
-            # The last sphere contains only unreachable locations
+    for sphere_num, per_player_ids in engine.unchecked_by_sphere(
+            unreachable_sphere, guaranteed_in_logic_only):
+        if not per_player_ids:
             continue
-
-        if guaranteed_in_logic_only:
-            per_player_locs_reduced: dict[str, dict[str, int]] = {}
-            for player_name, locs_dict in per_player_locs.items():
-                player_id = player_name_to_id[player_name]
-                player_locs = locations[player_id]
-                for loc_id in locs_dict.values():
-                    item_player_id = player_locs[loc_id][1]
-                    if item_player_id == player_id:
-                        # Reachable local items do not block the player because they can just get the local item.
-                        continue
-                    if ItemClassification.progression not in ItemClassification(player_locs[loc_id][2]):
-                        # Non-progression does not block.
-                        continue
-                    if ignore_emblems_and_strawberries:
-                        item_id = player_locs[loc_id][0]
-                        item_name = item_id_to_name_game_data_packages[mw.slot_info[item_player_id].game_name][item_id]
-                        if item_name in ("Emblem", "Strawberry"):
-                            continue
-                    missing_progression_items_after_sphere.add(item_player_id)
-
-                if player_id in players_missing_progression_items:
-                    # The current player might not be able to reach locations in this sphere.
-                    continue
-                else:
-                    per_player_locs_reduced[player_name] = locs_dict
-        else:
-            per_player_locs_reduced = per_player_locs
-
-        if any(per_player_locs_reduced.values()):
-            non_empty_per_player_locs = {k: v for k, v in per_player_locs_reduced.items() if v}
-            print(f"{sphere_num} ({sum(map(len, non_empty_per_player_locs.values()))}):")
-            for player, locs in sorted(non_empty_per_player_locs.items(), key=lambda t: t[0], reverse=True):
-                player_locations[player] += locs
-                reachable_counts[player] += len(locs)
-                print(f"\t{player} ({len(locs)}):\n\t\t{', '.join(sorted(locs.keys()))}")
-                all_player_names.add(player)
-                # print(f"\t{player} ({len(locs)})")
-            #print(f"{sphere_num}:\n\t{non_empty_per_player_locs}")
-
-        players_missing_progression_items.update(missing_progression_items_after_sphere)
+        print(f"{sphere_num} ({sum(map(len, per_player_ids.values()))}):")
+        per_player_locs = {
+            mw.slot_info[player_id].player_name: mw.datapackage.translate_locations(
+                mw.slot_info[player_id].game_name, location_ids)
+            for player_id, location_ids in per_player_ids.items()
+        }
+        for player, locs in sorted(per_player_locs.items(), key=lambda t: t[0], reverse=True):
+            player_locations[player] += locs
+            reachable_counts[player] += len(locs)
+            print(f"\t{player} ({len(locs)}):\n\t\t{', '.join(sorted(locs))}")
+            all_player_names.add(player)
 
     if guaranteed_in_logic_only:
         print(*sorted(reachable_counts.items(), key=lambda t: t[0].casefold()), sep="\n")
@@ -158,16 +75,73 @@ def find_unchecked_progression(
         for player, locs in sorted(player_locations.items(), key=lambda t: t[0].casefold()):
             sorted_locs = sorted(locs)
             print(player, len(sorted_locs), ", ".join(sorted_locs), sep="\t")
-            #print("\t" + ", ".join(sorted_locs))
     else:
         print(sorted(all_player_names, key=str.casefold))
         print(*sorted(reachable_counts.items(), key=lambda t: t[0].casefold()), sep="\n")
 
-if __name__ == "__main__":
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.description = "Show which locations should be reachable but " \
+        "weren't checked yet, according to the spoiler spheres."
+
+    parser.add_argument("--unreachable-sphere", type=int, default=None,
+                        dest='unreachable_sphere',
+                        help="Sphere that contains only unreachable locations "
+                        "(default: the last one, if the one before it is empty)")
+    parser.add_argument("--progression-only",
+                        action=argparse.BooleanOptionalAction, default=True,
+                        dest='progression_only',
+                        help="Only look at locations with progression items")
+    parser.add_argument("--guaranteed-in-logic-only",
+                        action=argparse.BooleanOptionalAction, default=True,
+                        dest='guaranteed_in_logic_only',
+                        help="Only show locations that are still reachable "
+                        "with the progression items that are still missing")
+    # Emblems and Strawberries don't unlock much, but they can still be
+    # logically relevant outside of the goal, so enabling this will no longer
+    # 100% guarantee reachability.
+    parser.add_argument("--ignore-emblems-and-strawberries",
+                        action='store_true', default=False,
+                        dest='ignore_emblems_and_strawberries',
+                        help="Don't count missing Emblems and Strawberries "
+                        "as blocking")
+    parser.add_argument("--cache-dir", type=str, default=None,
+                        dest='cache_dir',
+                        help="Directory to cache parsed multiworlds in")
+    parser.add_argument("--checks", type=str, default=None,
+                        help="Take the checked locations from this server save "
+                        "(.apsave) or JSON export (e.g. of the tracker API) "
+                        "instead of the sphere tracker page")
+    parser.add_argument("--team", type=int, default=0,
+                        help="Which team's checks to use with --checks")
+    parser.add_argument("multiworld", type=str,
+                        help="Output zip or .archipelago of the multiworld")
+    # Download the sphere tracker through right click -> save link as
+    parser.add_argument("sphere_tracker", type=str, nargs='?', default=None,
+                        help="Saved sphere tracker page of the room")
+
+    args = parser.parse_args()
+    if (args.checks is None) == (args.sphere_tracker is None):
+        parser.error("Specify either a sphere tracker page or --checks")
+    cache = None
+    if args.cache_dir is not None:
+        cache = multiworld.ParseCache(args.cache_dir)
+    mw = multiworld.parse(args.multiworld, cache=cache)
+    checked = None
+    if args.checks is not None:
+        checked = location_checks.load(args.checks, args.team)
     find_unchecked_progression(
-        progression_only=True,
-        guaranteed_in_logic_only=True,
-        # Emblems and Strawberries don't unlock much, but they can still be logically relevant outside of the goal, so
-        # enabling this will no longer 100% guarantee reachability.
-        ignore_emblems_and_strawberries=False,
+        mw,
+        args.sphere_tracker,
+        checked,
+        unreachable_sphere=args.unreachable_sphere,
+        progression_only=args.progression_only,
+        guaranteed_in_logic_only=args.guaranteed_in_logic_only,
+        ignore_emblems_and_strawberries=args.ignore_emblems_and_strawberries,
     )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
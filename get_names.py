@@ -8,13 +8,11 @@
 import json
 import logging
 import pathlib
+import player_yamls
 import sys
-import yaml
-from typing import Any
 
 
 log = logging.getLogger(__name__)
-meta_root_options = {"meta_description"}
 
 
 @dataclasses.dataclass
@@ -31,57 +29,59 @@ def main() -> int:
     parser = argparse.ArgumentParser()
     parser.description = "Get the names."
 
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="How many YAMLs to parse at the same time")
+    parser.add_argument("--yaml-cache", type=str, default=None,
+                        dest='yaml_cache',
+                        help="Where to cache what was found in the player YAMLs "
+                        "(default: next to the players folder)")
+    parser.add_argument("--no-cache", action='store_true', default=False,
+                        dest='nocache',
+                        help="Don't use or write the YAML cache")
     parser.add_argument("players", type=str, help="Player folder containing the YAMLs")
 
     args = parser.parse_args()
     all_weights: list[WeightsFile] = []
 
-    for child in pathlib.Path(args.players).iterdir():
-        if not child.is_file():
-            continue
-        try:
-            with open(child, 'rt', encoding='utf-8-sig') as f:
-                inp = list(yaml.safe_load_all(f.read()))
-        except:
-            log.exception(f"Failed to parse {child}")
-            return 1
-        for i, content in enumerate(inp):
+    players_path = pathlib.Path(args.players)
+    if args.nocache:
+        yaml_cache = player_yamls.YamlCache(None)
+    elif args.yaml_cache is not None:
+        yaml_cache = player_yamls.YamlCache(pathlib.Path(args.yaml_cache))
+    else:
+        yaml_cache = player_yamls.YamlCache(
+            player_yamls.default_cache_path(players_path))
+    try:
+        player_files = player_yamls.load_folder(players_path, args.jobs,
+                                                yaml_cache)
+    except player_yamls.ParseError:
+        return 1
+    yaml_cache.save()
+
+    for player_file in player_files:
+        child = player_file.path
+        for doc in player_file.documents:
+            i = doc.index
             weights = WeightsFile(
                 path=child,
                 index=i,
             )
 
-            if 'game' not in content:
-                if 'meta_description' not in content:
-                    info.warning(f"{child} #{i + 1} does not have 'game'")
+            if not doc.has_game:
+                if not doc.is_meta:
+                    log.warning(f"{child} #{i + 1} does not have 'game'")
                 continue
 
-            if type(content['game']) is str:
-                weights.games.append(content['game'])
-            elif type(content['game']) is dict:
-                weights.games.extend((game
-                                      for game, weight in content['game'].items()
-                                      if weight != 0))
-            else:
-                log.warning(f"{child} #{i + 1} unknown 'game' {type(game)}")
-                log.debug(f"{child} #{i + 1} unknown 'game' was %r", game)
+            if doc.game_type is not None:
+                log.warning(f"{child} #{i + 1} unknown 'game' {doc.game_type}")
                 continue
+            weights.games.extend(doc.weighted_games)
 
-            weights.main_name = content['name']
-
-            triggers = content.get('triggers', [])
-            for game in weights.games:
-                triggers.extend(content.get(game, {}).get('triggers', []))
-
-            for trigger in triggers:
-                opts = trigger.get('options', {})
-                name = None
-                if '' in opts and 'name' in opts['']:
-                    name = opts['']['name']
-                elif None in opts and 'name' in opts[None]:
-                    name = opts[None]['name']
-                if name is not None:
-                    weights.possible_names.append(name)
+            if doc.name is None:
+                log.warning(f"{child} #{i + 1} does not have 'name'")
+                continue
+            weights.main_name = doc.name
+            weights.possible_names.extend(doc.possible_names)
 
             all_weights.append(weights)
 
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: CC0-1.0
+
+# Reads which locations were checked already out of the save file of a
+# running multiworld (.apsave) or a JSON export, e.g. of the tracker API.
+
+import io
+import json
+import logging
+import pathlib
+import sys
+from typing import Any
+
+import multiworld
+import unpickle
+from multiworld import PlayerId
+
+
+log = logging.getLogger(__name__)
+
+CheckedLocations = dict[PlayerId, set[int]]
+
+
+def _defaultdict(default_factory: Any = None, *args) -> dict:
+    # The factory would only be an Unpickled, a plain dict is enough here
+    return dict(*args)
+
+
+unpickle_mapping: unpickle.ResolveMapping = {
+    ('collections', 'defaultdict'): _defaultdict,
+}
+
+
+def _from_team_slots(location_checks: Any, team: int) -> CheckedLocations:
+    checked: CheckedLocations = {}
+    for key, location_ids in location_checks.items():
+        if type(key) is not tuple or len(key) != 2:
+            log.debug("Ignoring location checks for %r", key)
+            continue
+        if key[0] == team:
+            checked.setdefault(key[1], set()).update(location_ids)
+    return checked
+
+
+def load_apsave(path, team: int = 0) -> CheckedLocations:
+    """
+    Checked locations of a team from a server save file, which is a zlib
+    compressed pickle of which only location_checks is used.
+    """
+    with open(path, 'rb') as f:
+        inner_file = io.BufferedReader(multiworld._InflatingReader(f),
+                                       multiworld._InflatingReader.chunk_size)
+        with inner_file:
+            data = unpickle.Unpickler(inner_file,
+                                      mapping=unpickle_mapping).load()
+    if type(data) is not dict or 'location_checks' not in data:
+        raise ValueError(f"{path} has no location checks")
+    return _from_team_slots(data['location_checks'], team)
+
+
+def from_json(data: Any, team: int = 0) -> CheckedLocations:
+    """
+    Checked locations out of JSON data, either the tracker API response
+    (with player_checks_done) or {"location_checks": {player: [ids]}},
+    with or without the location_checks wrapper.
+    """
+    if type(data) is dict and 'player_checks_done' in data:
+        checked: CheckedLocations = {}
+        for entry in data['player_checks_done']:
+            if entry.get('team', 0) == team:
+                checked.setdefault(int(entry['player']), set()) \
+                    .update(entry['locations'])
+        return checked
+    if type(data) is dict and 'location_checks' in data:
+        data = data['location_checks']
+    if type(data) is not dict:
+        raise ValueError("Expected an object of location checks")
+    return {int(player): set(location_ids)
+            for player, location_ids in data.items()}
+
+
+def load_json(path, team: int = 0) -> CheckedLocations:
+    with open(path, 'rt', encoding='utf-8') as f:
+        return from_json(json.load(f), team)
+
+
+def load(path, team: int = 0) -> CheckedLocations:
+    """Checked locations from a .apsave or a .json file"""
+    if pathlib.Path(path).suffix.lower() == '.json':
+        return load_json(path, team)
+    return load_apsave(path, team)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr, level=logging.DEBUG)
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.description = "Show the checked locations of a save file or JSON export"
+
+    parser.add_argument("--team", type=int, default=0,
+                        help="Which team to show the checks of")
+    parser.add_argument("checks", type=str,
+                        help="Path to the .apsave or .json file")
+
+    args = parser.parse_args()
+    for player, location_ids in sorted(load(args.checks, args.team).items()):
+        print(player, len(location_ids), sorted(location_ids), sep='\t')
@@ -2,14 +2,29 @@
 
 # SPDX-License-Identifier: CC0-1.0
 
+import array
+import bisect
+import builtins
+import collections.abc
+import contextlib
 import dataclasses
+import functools
+import gc
+import hashlib
+import itertools
+import json
 import logging
+import mmap
+import operator
+import os
+import pathlib
+import pickle
 import sys
 import unpickle
 import zlib
 import io
 import zipfile
-from typing import Any, Optional, Iterator
+from typing import Any, Optional, Iterable, Iterator
 
 log = logging.getLogger(__name__)
 
@@ -66,6 +81,201 @@ class Hint:
     hint_status: int
 
 
+@functools.cache
+def _has_numpy() -> bool:
+    # Only imported once a filter needs it, most tools never get that far
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class PlayerLocations:
+    """
+    The locations of one player as columns, sorted by location id.
+    Filters run over whole columns at once instead of a tuple per location,
+    vectorised if NumPy is available.
+    """
+
+    def __init__(self, locations: dict[int, tuple]):
+        self.location_ids = array.array('q', sorted(locations.keys()))
+        self.item_ids = array.array('q')
+        self.item_players = array.array('q')
+        self.flags = array.array('q')
+        for location_id in self.location_ids:
+            item_id, item_player, flags = locations[location_id][:3]
+            self.item_ids.append(item_id)
+            self.item_players.append(item_player)
+            self.flags.append(flags)
+        self._numpy_columns: Optional[dict[str, Any]] = None
+
+    def __len__(self) -> int:
+        return len(self.location_ids)
+
+    def index(self, location_id: int) -> Optional[int]:
+        """Row of a location, or None if there is no such location"""
+        i = bisect.bisect_left(self.location_ids, location_id)
+        if i < len(self.location_ids) and self.location_ids[i] == location_id:
+            return i
+        return None
+
+    def get(self, location_id: int) -> Optional[tuple[int, int, int]]:
+        """Same tuple as in MultiWorld.locations"""
+        i = self.index(location_id)
+        if i is None:
+            return None
+        return (self.item_ids[i], self.item_players[i], self.flags[i])
+
+    def _rows_equal(self, column: array.array, value: int) -> list[int]:
+        # array.index scans in C, which beats comparing element by element
+        rows = []
+        row = -1
+        try:
+            while True:
+                row = column.index(value, row + 1)
+                rows.append(row)
+        except ValueError:
+            return rows
+
+    def with_flags(self, flags: int) -> list[int]:
+        """Location ids whose item has any of the classification flags"""
+        if _has_numpy():
+            columns = self.as_numpy()
+            return columns['location_ids'][
+                (columns['flags'] & flags) != 0].tolist()
+        return list(itertools.compress(
+            self.location_ids,
+            map(operator.and_, self.flags, itertools.repeat(flags))))
+
+    def for_player(self, player: PlayerId,
+                   flags: Optional[int] = None) -> list[int]:
+        """
+        Location ids whose item belongs to player. If flags is given, only
+        those whose item has any of the classification flags.
+        """
+        if _has_numpy():
+            columns = self.as_numpy()
+            mask = columns['item_players'] == player
+            if flags is not None:
+                mask &= (columns['flags'] & flags) != 0
+            return columns['location_ids'][mask].tolist()
+        location_ids, item_flags = self.location_ids, self.flags
+        return [location_ids[row]
+                for row in self._rows_equal(self.item_players, player)
+                if flags is None or item_flags[row] & flags]
+
+    def as_numpy(self) -> dict[str, Any]:
+        """The columns as NumPy arrays, sharing memory with the arrays"""
+        import numpy
+        if self._numpy_columns is None:
+            self._numpy_columns = {
+                name: numpy.frombuffer(getattr(self, name), dtype=numpy.int64)
+                for name in ('location_ids', 'item_ids', 'item_players',
+                             'flags')}
+        return self._numpy_columns
+
+
+class LocationTable:
+    """Columnar view of MultiWorld.locations"""
+
+    def __init__(self, locations: dict[PlayerId, dict[int, tuple]]):
+        self.players: dict[PlayerId, PlayerLocations] = {
+            player: PlayerLocations(player_locations)
+            for player, player_locations in locations.items()
+        }
+
+    def __getitem__(self, player: PlayerId) -> PlayerLocations:
+        return self.players[player]
+
+    def with_flags(self, player: PlayerId, flags: int) -> list[int]:
+        """Locations in player's world with items having any of the flags"""
+        return self.players[player].with_flags(flags)
+
+    def items_for_player(self, player: PlayerId,
+                         flags: Optional[int] = None
+                         ) -> dict[PlayerId, list[int]]:
+        """
+        Where the items of player are placed, by world and location id.
+        If flags is given, only items with any of the flags are included.
+        """
+        found = {}
+        for finder, columns in self.players.items():
+            location_ids = columns.for_player(player, flags)
+            if location_ids:
+                found[finder] = location_ids
+        return found
+
+
+class Datapackage(collections.abc.Mapping):
+    """
+    The datapackage of every game in the multiworld, by game name. The
+    id to name maps are only built for games that are actually looked up,
+    and are shared by everything in the process with the same checksum.
+    """
+
+    # (game, checksum, which) -> id to name map
+    _shared: dict[tuple[GameName, str, str], dict[int, str]] = {}
+
+    def __init__(self, games: Optional[dict[GameName, dict[str, Any]]] = None):
+        self.games = games if games is not None else {}
+        self._names: dict[tuple[GameName, str], dict[int, str]] = {}
+
+    def __getitem__(self, game: GameName) -> dict[str, Any]:
+        return self.games[game]
+
+    def __iter__(self) -> Iterator[GameName]:
+        return iter(self.games)
+
+    def __len__(self) -> int:
+        return len(self.games)
+
+    def __repr__(self) -> str:
+        return f"Datapackage({self.games!r})"
+
+    def _id_to_name(self, game: GameName, which: str) -> dict[int, str]:
+        key = (game, which)
+        names = self._names.get(key)
+        if names is not None:
+            return names
+        game_data = self.games.get(game, {})
+        checksum = game_data.get('checksum')
+        shared_key = (game, checksum, which)
+        if checksum is not None and shared_key in self._shared:
+            names = self._shared[shared_key]
+        else:
+            names = {id_: name
+                     for name, id_ in game_data.get(which, {}).items()}
+            if checksum is not None:
+                self._shared[shared_key] = names
+        self._names[key] = names
+        return names
+
+    def location_names(self, game: GameName) -> dict[int, str]:
+        """Location id to name map of a game, don't modify it"""
+        return self._id_to_name(game, 'location_name_to_id')
+
+    def item_names(self, game: GameName) -> dict[int, str]:
+        """Item id to name map of a game, don't modify it"""
+        return self._id_to_name(game, 'item_name_to_id')
+
+    def location_name(self, game: GameName, location_id: int) -> Optional[str]:
+        return self.location_names(game).get(location_id)
+
+    def item_name(self, game: GameName, item_id: int) -> Optional[str]:
+        return self.item_names(game).get(item_id)
+
+    def translate_locations(self, game: GameName,
+                            location_ids: Iterable[int]) -> list[Optional[str]]:
+        """Names of many locations at once, None for unknown ids"""
+        return list(map(self.location_names(game).get, location_ids))
+
+    def translate_items(self, game: GameName,
+                        item_ids: Iterable[int]) -> list[Optional[str]]:
+        """Names of many items at once, None for unknown ids"""
+        return list(map(self.item_names(game).get, item_ids))
+
+
 @dataclasses.dataclass
 class MultiWorld:
     slot_data: dict[PlayerId, dict[str, Any]] = dataclasses.field(default_factory=dict)
@@ -76,14 +286,79 @@ class MultiWorld:
     version: Optional[tuple[int, int, int]] = (0, 0, 0)
     seed_name: str = ""
     race_mode: int = 0  # TODO: What do the numbers mean?
+    datapackage: Datapackage = dataclasses.field(default_factory=Datapackage)
+    # Location ids that become reachable in each sphere, by player
+    spheres: list[dict[PlayerId, set[int]]] = dataclasses.field(default_factory=list)
+    # The remaining top level keys of the multiworld data as they are
+    extras: dict[str, Any] = dataclasses.field(default_factory=dict)
+
+    # The indexes below are built on first use, so slot_info and datapackage
+    # shouldn't be changed after that.
+
+    @functools.cached_property
+    def location_table(self) -> LocationTable:
+        """locations as columns"""
+        return LocationTable(self.locations)
+
+    @functools.cached_property
+    def player_ids_by_name(self) -> dict[PlayerName, PlayerId]:
+        return {slot.player_name: player_id
+                for player_id, slot in self.slot_info.items()}
+
+    @functools.cached_property
+    def player_ids_by_casefold_name(self) -> dict[str, PlayerId]:
+        player_ids = {}
+        for player_id, slot in self.slot_info.items():
+            player_ids.setdefault(slot.player_name.casefold(), player_id)
+        return player_ids
+
+    @functools.cached_property
+    def player_ids_by_game(self) -> dict[GameName, list[PlayerId]]:
+        player_ids: dict[GameName, list[PlayerId]] = {}
+        for player_id, slot in self.slot_info.items():
+            player_ids.setdefault(slot.game_name, []).append(player_id)
+        return player_ids
+
+    @functools.cached_property
+    def datapackage_by_player_id(self) -> dict[PlayerId, dict[str, Any]]:
+        return {player_id: self.datapackage[slot.game_name]
+                for player_id, slot in self.slot_info.items()
+                if slot.game_name in self.datapackage}
+
+    def get_player_id(self, player_name: str,
+                      casefold: bool = False) -> Optional[PlayerId]:
+        if casefold:
+            return self.player_ids_by_casefold_name.get(player_name.casefold())
+        return self.player_ids_by_name.get(player_name)
+
+    def get_player_ids(self, player_names: Iterable[str],
+                       casefold: bool = False
+                       ) -> dict[str, Optional[PlayerId]]:
+        return {player_name: self.get_player_id(player_name, casefold)
+                for player_name in player_names}
 
     def get_slots_by_game_name(self, game_name: str) -> Iterator[SlotInfo]:
-        return filter(lambda slot: slot.game_name == game_name,
-                      self.slot_info.values())
+        return map(self.slot_info.__getitem__,
+                   self.player_ids_by_game.get(game_name, ()))
+
+    def get_slots_by_game_names(self, game_names: Iterable[str]
+                                ) -> dict[GameName, list[SlotInfo]]:
+        return {game_name: list(self.get_slots_by_game_name(game_name))
+                for game_name in game_names}
 
     def get_slot_by_player_name(self, player_name: str) -> Optional[SlotInfo]:
-        return next(filter(lambda slot: slot.player_name == player_name,
-                           self.slot_info.values()), None)
+        player_id = self.player_ids_by_name.get(player_name)
+        return None if player_id is None else self.slot_info[player_id]
+
+    def get_slots_by_player_names(self, player_names: Iterable[str]
+                                  ) -> dict[PlayerName, Optional[SlotInfo]]:
+        return {player_name: self.get_slot_by_player_name(player_name)
+                for player_name in player_names}
+
+    def get_datapackage(self, player_id: PlayerId
+                        ) -> Optional[dict[str, Any]]:
+        """Datapackage of the game player_id plays"""
+        return self.datapackage_by_player_id.get(player_id)
 
 
 unpickle_mapping: unpickle.ResolveMapping = {
@@ -94,37 +369,352 @@ def get_slot_by_player_name(self, player_name: str) -> Optional[SlotInfo]:
 }
 
 
-def _find_multiworld(raw_data: Any) -> bytes:
-    if type(raw_data) is bytes or type(raw_data) is bytearray:
-        raw_data = io.BytesIO(raw_data)
+class _InflatingReader(io.RawIOBase):
+    """
+    Decompresses zlib data while it is being read, so the whole inflated
+    pickle never has to be in memory at once. The compressed data is either
+    a buffer or a file to read it from.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, source: Any):
+        if hasattr(source, 'read'):
+            self._file = source
+            self._data = None
+        else:
+            self._file = None
+            self._data = memoryview(source)
+        self._pos = 0
+        self._decompressor = zlib.decompressobj()
+
+    def readable(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        if self._data is not None:
+            self._data.release()  # So a mmap it points into can be closed
+        super().close()
+
+    def _read_compressed(self) -> bytes | memoryview:
+        if self._file is not None:
+            return self._file.read(self.chunk_size)
+        # Slicing a memoryview doesn't copy
+        chunk = self._data[self._pos:self._pos + self.chunk_size]
+        self._pos += len(chunk)
+        return chunk
+
+    def readinto(self, buffer) -> int:
+        decompressor = self._decompressor
+        while True:
+            if decompressor.unconsumed_tail:
+                compressed = decompressor.unconsumed_tail
+            elif decompressor.eof:
+                return 0
+            else:
+                compressed = self._read_compressed()
+                if not compressed:
+                    raise EOFError("Compressed multiworld data ended "
+                                   "before the end of the stream")
+            inflated = decompressor.decompress(compressed, len(buffer))
+            if inflated:
+                buffer[:len(inflated)] = inflated
+                return len(inflated)
+
+
+def _open_inner(source) -> tuple[int, io.BufferedReader]:
+    """
+    Returns the format version and a stream of the inflated pickle.
+    source is either the .archipelago contents or a file positioned at
+    their start.
+    """
+    if hasattr(source, 'read'):
+        header = source.read(1)
+        if not header:
+            raise EOFError("Multiworld data is empty")
+        format_version = header[0]
+    else:
+        with memoryview(source) as raw_data:
+            format_version = raw_data[0]
+            source = raw_data[1:]
+    logging.debug("Found multiworld format version 0x%02x", format_version)
+    # TODO: Check format version
+    return (format_version,
+            io.BufferedReader(_InflatingReader(source),
+                              _InflatingReader.chunk_size))
+
+
+def _map_file(f, stack: contextlib.ExitStack) -> Any:
+    """The whole contents of a file, without copying them if possible"""
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError, io.UnsupportedOperation):
+        # Not a real file (or an empty one)
+        f.seek(0)
+        return f.read()
+    stack.callback(mm.close)
+    return mm
+
+
+def _open_multiworld(source: Any,
+                     stack: contextlib.ExitStack) -> io.BufferedReader:
+    """
+    Open the inflated pickle of a multiworld, found in the .archipelago
+    member of an output zip or in a bare .archipelago.
+    source can be a path, a seekable binary file or the contents.
+    Only the .archipelago member of a zip is ever read.
+    """
+    raw_data = None
+    if isinstance(source, (str, os.PathLike)):
+        source = stack.enter_context(open(source, 'rb'))
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        raw_data = source
+        source = io.BytesIO(source)
+
     try:
-        with zipfile.ZipFile(raw_data) as zip_file:
-            for filename in zip_file.namelist():
-                if filename.endswith('.archipelago'):
-                    return zip_file.read(filename)
+        zip_file = stack.enter_context(zipfile.ZipFile(source))
     except zipfile.BadZipFile:
-        raw_data.seek(0)
-        return raw_data.read()
+        if raw_data is None:
+            raw_data = _map_file(source, stack)
+        return stack.enter_context(_open_inner(raw_data)[1])
+
+    for filename in zip_file.namelist():
+        if filename.endswith('.archipelago'):
+            member = stack.enter_context(zip_file.open(filename))
+            return stack.enter_context(_open_inner(member)[1])
     raise FileNotFoundError("Could not find .archipelago file")
 
 
-def parse(raw_data: Any) -> MultiWorld:
-    return parse_bytes(_find_multiworld(raw_data))
+@contextlib.contextmanager
+def _reopen_multiworld(source: Any) -> Iterator[io.BufferedReader]:
+    with contextlib.ExitStack() as stack:
+        yield _open_multiworld(source, stack)
 
 
-def _get_inner(raw_data) -> tuple[int, bytes]:
-    format_version = raw_data[0]
-    logging.debug("Found multiworld format version 0x%02x", format_version)
-    # TODO: Check format version
-    return (format_version, zlib.decompress(raw_data[1:]))
+@contextlib.contextmanager
+def _gc_paused() -> Iterator[None]:
+    """
+    The garbage collector keeps running while unpickling the hundreds of
+    thousands of containers in a multiworld, without finding anything.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+class _CacheUnpickler(pickle.Unpickler):
+    """Only allows what ParseCache stores, the cache might not be ours"""
+
+    classes = {'SlotInfo', 'Hint', 'ServerOptions'}
+    builtins = {'set', 'frozenset'}
+
+    def find_class(self, module: str, name: str):
+        # Pickled as __main__ when stored by running this file directly
+        if module in (__name__, 'multiworld', '__main__') \
+                and name in self.classes:
+            return globals()[name]
+        if module == 'builtins' and name in self.builtins:
+            return getattr(builtins, name)
+        if module == 'unpickle' and name == '_restore':
+            return unpickle._restore
+        raise pickle.UnpicklingError(f"Not allowed in the cache: {module}.{name}")
+
+
+class ParseCache:
+    """
+    Directory of resolved multiworld data, so parsing the same multiworld
+    again is mostly just loading a pickle. Entries are found by the path,
+    size and modification time of the multiworld file, or else by the hash
+    of its contents. The least recently used entries are removed when there
+    are more than max_entries or they take more than max_size bytes.
+    """
+
+    index_name = 'index.json'
+    version = 1
+
+    def __init__(self, path, max_entries: int = 16,
+                 max_size: int = 1024 * 1024 * 1024):
+        self.path = pathlib.Path(path)
+        self.max_entries = max_entries
+        self.max_size = max_size
+        # Multiworld file path -> [size, mtime_ns, sha256]
+        self.sources: dict[str, list[Any]] = {}
+        # sha256 -> entry file name
+        self.entries: dict[str, str] = {}
+        try:
+            with open(self.path / self.index_name, 'rt',
+                      encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') == self.version:
+                self.sources = index['sources']
+                self.entries = index['entries']
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            log.warning("Ignoring broken multiworld cache index in %s",
+                        self.path, exc_info=True)
+
+    def _digest(self, source_path: pathlib.Path, st: os.stat_result) -> str:
+        key = str(source_path)
+        known = self.sources.get(key)
+        if known is not None and known[:2] == [st.st_size, st.st_mtime_ns]:
+            return known[2]
+        digest = hashlib.sha256()
+        with open(source_path, 'rb') as f:
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+        self.sources[key] = [st.st_size, st.st_mtime_ns, digest.hexdigest()]
+        return self.sources[key][2]
+
+    def load(self, source_path) -> Optional[dict[str, Any]]:
+        """Cached data of the multiworld file at source_path, if any"""
+        source_path = pathlib.Path(source_path).absolute()
+        digest = self._digest(source_path, source_path.stat())
+        entry_name = self.entries.get(digest)
+        if entry_name is None:
+            return None
+        entry_path = self.path / entry_name
+        try:
+            with open(entry_path, 'rb') as f:
+                data = _CacheUnpickler(f).load()
+            os.utime(entry_path)  # For evicting the least recently used
+        except FileNotFoundError:
+            return None
+        except Exception:
+            log.warning("Ignoring broken multiworld cache entry %s",
+                        entry_path, exc_info=True)
+            return None
+        self._save_index()
+        return data
+
+    def store(self, source_path, data: dict[str, Any]) -> None:
+        source_path = pathlib.Path(source_path).absolute()
+        digest = self._digest(source_path, source_path.stat())
+        seed_name = ''.join(c for c in str(data.get('seed_name', ''))
+                            if c.isalnum())
+        entry_name = f'{seed_name}-{digest[:32]}.pickle'
+        entry_path = self.path / entry_name
+        tmp_path = entry_path.with_name(entry_name + '.tmp')
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, entry_path)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            log.warning("Failed to cache multiworld in %s", entry_path,
+                        exc_info=True)
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            return
+        self.entries[digest] = entry_name
+        self._evict()
+        self._save_index()
+
+    def _evict(self) -> None:
+        entries = []
+        for digest, entry_name in self.entries.items():
+            try:
+                st = (self.path / entry_name).stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, digest, entry_name))
+        entries.sort(reverse=True)  # Most recently used first
+        total_size = 0
+        kept = {}
+        for i, (_, size, digest, entry_name) in enumerate(entries):
+            total_size += size
+            if i > 0 and (i >= self.max_entries or total_size > self.max_size):
+                log.debug("Removing %s from the multiworld cache", entry_name)
+                with contextlib.suppress(OSError):
+                    os.remove(self.path / entry_name)
+            else:
+                kept[digest] = entry_name
+        self.entries = kept
+        self.sources = {key: source
+                        for key, source in self.sources.items()
+                        if source[2] in kept}
+
+    def _save_index(self) -> None:
+        index_path = self.path / self.index_name
+        tmp_path = index_path.with_name(self.index_name + '.tmp')
+        try:
+            with open(tmp_path, 'wt', encoding='utf-8') as f:
+                json.dump({'version': self.version, 'sources': self.sources,
+                           'entries': self.entries}, f)
+            os.replace(tmp_path, index_path)
+        except OSError:
+            log.warning("Failed to write multiworld cache index in %s",
+                        self.path, exc_info=True)
+
+
+def load(source: Any, resolve: bool = True,
+         fields: Optional[Iterable[str]] = None,
+         cache: Optional[ParseCache] = None) -> dict[str, Any]:
+    """
+    Unpickle the multiworld data as it is, see _open_multiworld for what
+    source can be. If fields is given, only those top level keys are kept.
+    Without a cache, the others are then dropped before resolving, which
+    is a lot faster if only small fields are wanted.
+    The cache is only used for resolved data of paths.
+    """
+    if not isinstance(source, (str, os.PathLike)) or not resolve:
+        cache = None
+    if fields is not None:
+        fields = set(fields)
+    with _gc_paused():
+        data = None if cache is None else cache.load(source)
+        if data is None:
+            # Resolving while unpickling saves walking everything afterwards,
+            # unless most of it is dropped anyway
+            drop_first = cache is None and fields is not None
+            with contextlib.ExitStack() as stack:
+                data = unpickle.Unpickler(
+                    _open_multiworld(source, stack),
+                    mapping=unpickle_mapping
+                    if resolve and not drop_first else None,
+                    reopen=functools.partial(_reopen_multiworld, source)
+                ).load()
+            if drop_first and type(data) is dict:
+                data = {key: value for key, value in data.items()
+                        if key in fields}
+                if resolve:
+                    data = unpickle.resolve(data, unpickle_mapping)
+            if cache is not None and type(data) is dict:
+                cache.store(source, data)
+    if fields is not None and type(data) is dict:
+        data = {key: value for key, value in data.items() if key in fields}
+    return data
+
+
+def parse(source: Any, fields: Optional[Iterable[str]] = None,
+          cache: Optional[ParseCache] = None) -> MultiWorld:
+    """
+    Parse a multiworld, see _open_multiworld for what source can be.
+    With fields, only those MultiWorld fields are filled in.
+    """
+    return from_data(load(source, fields=fields, cache=cache))
 
 
 def parse_bytes(raw_data: bytes) -> MultiWorld:
-    format_version, inner_data = _get_inner(raw_data)
+    """Parse the contents of an .archipelago file"""
+    format_version, inner_file = _open_inner(raw_data)
     # TODO: Check format version
-    data = unpickle.Unpickler(io.BytesIO(inner_data)).load()
-    data = unpickle.resolve(data, unpickle_mapping)
+    with inner_file:
+        data = unpickle.Unpickler(inner_file, mapping=unpickle_mapping).load()
+    return from_data(data)
 
+
+# Keys of the multiworld data that end up in a MultiWorld field
+_multiworld_keys = {field.name for field in dataclasses.fields(MultiWorld)} \
+    - {'extras'}
+
+
+def from_data(data: dict[str, Any]) -> MultiWorld:
+    """Create a MultiWorld out of the resolved multiworld data"""
     so = data.get('server_options', {})
     server_options = ServerOptions(host=so.get('host', None),
                                    port=so.get('port', None),
@@ -140,7 +730,12 @@ def parse_bytes(raw_data: bytes) -> MultiWorld:
                       locations=data.get('locations', {}),
                       seed_name=data.get('seed_name', ''),
                       race_mode=data.get('race_mode', 0),
-                      server_options=server_options
+                      server_options=server_options,
+                      datapackage=Datapackage(data.get('datapackage', {})),
+                      spheres=data.get('spheres', []),
+                      extras={key: value
+                              for key, value in data.items()
+                              if key not in _multiworld_keys}
                       )
 
 
@@ -154,14 +749,15 @@ def parse_bytes(raw_data: bytes) -> MultiWorld:
     parser.add_argument("--no-resolve", action='store_true', default=False,
                         dest='noresolve',
                         help="Don't resolve objects")
+    parser.add_argument("--cache-dir", type=str, default=None,
+                        dest='cache_dir',
+                        help="Directory to cache parsed multiworlds in")
     parser.add_argument("world", type=str,
                         help="Path to .archipelago or .zip file")
 
     args = parser.parse_args()
-    with open(args.world, 'rb') as f:
-        if args.noresolve:
-            pprint.pp(unpickle.Unpickler(
-                io.BytesIO(_get_inner(_find_multiworld(f))[1])
-            ).load(), width=200)
-        else:
-            pprint.pp(parse(f), width=200)
+    if args.noresolve:
+        pprint.pp(load(args.world, resolve=False), width=200)
+    else:
+        cache = None if args.cache_dir is None else ParseCache(args.cache_dir)
+        pprint.pp(parse(args.world, cache=cache), width=200)
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: CC0-1.0
+
+# Loads the player YAMLs of a Players folder and extracts only what the tools
+# need from them, so the (big) option trees can be thrown away immediately.
+
+import concurrent.futures
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import sys
+import yaml
+from typing import Any, Optional
+
+
+log = logging.getLogger(__name__)
+meta_root_options = {"meta_description"}
+
+# The libyaml based loader is a lot faster, but might not be available
+Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+class ParseError(Exception):
+    """A player YAML could not be parsed"""
+
+
+@dataclasses.dataclass
+class PlayerDocument:
+    """What the tools need to know about one document of a player YAML"""
+    index: int
+    has_game: bool = False
+    game_type: Optional[str] = None  # Set if 'game' is neither str nor dict
+    games: list[str] = dataclasses.field(default_factory=list)  # Even weight 0
+    weighted_games: list[str] = dataclasses.field(default_factory=list)
+    name: Any = None
+    possible_names: list[Any] = dataclasses.field(default_factory=list)
+    is_meta: bool = False
+    meta_categories: list[Any] = dataclasses.field(default_factory=list)
+
+
+@dataclasses.dataclass
+class PlayerFile:
+    path: pathlib.Path
+    documents: list[PlayerDocument] = dataclasses.field(default_factory=list)
+
+
+def _trigger_names(triggers: Any) -> list[Any]:
+    names = []
+    if type(triggers) is not list:
+        return names
+    for trigger in triggers:
+        if type(trigger) is not dict:
+            continue
+        opts = trigger.get('options', {})
+        if type(opts) is not dict:
+            continue
+        name = None
+        if '' in opts and 'name' in opts['']:
+            name = opts['']['name']
+        elif None in opts and 'name' in opts[None]:
+            name = opts[None]['name']
+        if name is not None:
+            names.append(name)
+    return names
+
+
+def extract_document(index: int, content: Any) -> PlayerDocument:
+    doc = PlayerDocument(index=index)
+    if type(content) is not dict:
+        return doc
+
+    if 'game' in content:
+        doc.has_game = True
+        game = content['game']
+        if type(game) is str:
+            doc.games.append(game)
+            doc.weighted_games.append(game)
+        elif type(game) is dict:
+            doc.games.extend(game.keys())
+            doc.weighted_games.extend((name
+                                       for name, weight in game.items()
+                                       if weight != 0))
+        else:
+            doc.game_type = type(game).__name__
+
+    doc.name = content.get('name')
+    doc.possible_names.extend(_trigger_names(content.get('triggers')))
+    for game in doc.weighted_games:
+        game_options = content.get(game)
+        if type(game_options) is dict:
+            doc.possible_names.extend(_trigger_names(game_options.get('triggers')))
+
+    if 'meta_description' in content:
+        doc.is_meta = True
+        doc.meta_categories.extend((category
+                                    for category in content.keys()
+                                    if category not in meta_root_options))
+    return doc
+
+
+class _SkippingComposer(yaml.composer.Composer):
+    """
+    Composes only the parts of a player YAML document that extract_document
+    looks at: the top level keys, the game, name and triggers values and
+    the triggers of every other top level mapping (the per-game options).
+    Everything else is skipped event by event without building nodes, so
+    big option trees cost next to nothing.
+    Aliases to skipped anchors or to filtered mappings (which would be
+    missing keys) fail to compose, use the full load then.
+    """
+
+    kept_root_keys = {'game', 'name', 'triggers', '<<'}
+    kept_option_keys = {'triggers', '<<'}
+
+    def compose_document(self) -> yaml.Node:
+        self.filtered_anchors: set[str] = set()
+        self.get_event()  # DocumentStartEvent
+        if self.check_event(yaml.MappingStartEvent):
+            node = self._compose_filtered_mapping(self.kept_root_keys, True)
+        else:
+            node = self.compose_node(None, None)
+        self.get_event()  # DocumentEndEvent
+        self.anchors = {}
+        self.filtered_anchors = set()
+        return node
+
+    def compose_node(self, parent, index) -> yaml.Node:
+        event = self.peek_event()
+        if event.anchor in self.filtered_anchors:
+            # Either an alias to or a duplicate of a filtered mapping
+            raise yaml.composer.ComposerError(
+                None, None, f"found alias to filtered anchor {event.anchor!r}",
+                event.start_mark)
+        return super().compose_node(parent, index)
+
+    def _compose_filtered_mapping(self, keep: set[str],
+                                  root: bool) -> yaml.MappingNode:
+        start_event = self.get_event()
+        tag = start_event.tag
+        if tag is None or tag == '!':
+            tag = self.resolve(yaml.MappingNode, None, start_event.implicit)
+        node = yaml.MappingNode(tag, [], start_event.start_mark, None,
+                                flow_style=start_event.flow_style)
+        if start_event.anchor is not None:
+            self.filtered_anchors.add(start_event.anchor)
+        while not self.check_event(yaml.MappingEndEvent):
+            key = self.compose_node(node, None)
+            if type(key) is yaml.ScalarNode and key.value not in keep:
+                if root and self.check_event(yaml.MappingStartEvent):
+                    value = self._compose_filtered_mapping(
+                        self.kept_option_keys, False)
+                elif root:
+                    # Keep the key for meta categories, but not its value
+                    event = self.peek_event()
+                    self._skip_node()
+                    value = yaml.ScalarNode('tag:yaml.org,2002:null', '',
+                                            event.start_mark, event.end_mark)
+                else:
+                    self._skip_node()
+                    continue
+            else:
+                value = self.compose_node(node, key)
+            node.value.append((key, value))
+        node.end_mark = self.get_event().end_mark
+        return node
+
+    def _skip_node(self) -> None:
+        depth = 0
+        while True:
+            event = self.get_event()
+            if isinstance(event, yaml.CollectionStartEvent):
+                depth += 1
+            elif isinstance(event, yaml.CollectionEndEvent):
+                depth -= 1
+            if depth == 0:
+                return
+
+
+class GamesLoader(_SkippingComposer, Loader):
+    """Loader that only loads what extract_document needs"""
+
+    def __init__(self, stream):
+        Loader.__init__(self, stream)
+        yaml.composer.Composer.__init__(self)
+
+
+def parse_yaml(data: bytes) -> list[PlayerDocument]:
+    """Parse the contents of a player YAML into a PlayerDocument each"""
+    text = data.decode('utf-8-sig')
+    try:
+        return [extract_document(i, content)
+                for i, content
+                in enumerate(yaml.load_all(text, Loader=GamesLoader))]
+    except yaml.YAMLError:
+        # Probably an alias to something that was skipped, or a broken file
+        # which the full load will complain about properly.
+        log.debug("Falling back to loading everything", exc_info=True)
+    return [extract_document(i, content)
+            for i, content in enumerate(yaml.load_all(text, Loader=Loader))]
+
+
+class YamlCache:
+    """
+    Remembers the extracted documents of player YAMLs by the hash of their
+    contents, entries that weren't used are dropped when saving.
+    Within one process (e.g. when watching), files whose size and
+    modification time didn't change aren't read again either.
+    """
+
+    def __init__(self, path: Optional[pathlib.Path]):
+        self.path = path
+        self.entries: dict[str, list[dict[str, Any]]] = {}
+        self.used: set[str] = set()
+        self.digests: dict[str, tuple[int, int, str]] = {}  # Not saved
+        self.dirty = False
+        if path is None:
+            return
+        try:
+            with open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.entries[entry['sha256']] = entry['documents']
+                    except (ValueError, KeyError, TypeError):
+                        self.dirty = True  # Rewrite without the broken line
+        except FileNotFoundError:
+            pass
+        except OSError:
+            log.warning("Failed to read YAML cache %s", path, exc_info=True)
+
+    def known_digest(self, path: str, st: os.stat_result) -> Optional[str]:
+        """Hash of a file seen earlier in this process, if it didn't change"""
+        known = self.digests.get(path)
+        if known is None or known[:2] != (st.st_size, st.st_mtime_ns):
+            return None
+        return known[2]
+
+    def remember_digest(self, path: str, st: os.stat_result,
+                        digest: str) -> None:
+        self.digests[path] = (st.st_size, st.st_mtime_ns, digest)
+
+    def lookup(self, digest: str) -> Optional[list[PlayerDocument]]:
+        self.used.add(digest)
+        documents = self.entries.get(digest)
+        if documents is None:
+            return None
+        try:
+            return [PlayerDocument(**doc) for doc in documents]
+        except TypeError:
+            return None  # Outdated format, parse again
+
+    def store(self, digest: str, documents: list[PlayerDocument]) -> None:
+        self.used.add(digest)
+        self.entries[digest] = [dataclasses.asdict(doc) for doc in documents]
+        self.dirty = True
+
+    def save(self) -> None:
+        for digest in self.entries.keys() - self.used:
+            del self.entries[digest]
+            self.dirty = True
+        self.used = set()  # For the next run when watching
+        if self.path is None or not self.dirty:
+            return
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        try:
+            with open(tmp_path, 'wt', encoding='utf-8') as f:
+                for digest, documents in self.entries.items():
+                    try:
+                        line = json.dumps({'sha256': digest,
+                                           'documents': documents},
+                                          ensure_ascii=False)
+                    except (TypeError, ValueError):
+                        continue  # Something JSON can't hold, like dates
+                    f.write(line + '\n')
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError:
+            log.warning("Failed to write YAML cache %s", self.path,
+                        exc_info=True)
+
+
+def default_cache_path(players_path: pathlib.Path) -> pathlib.Path:
+    players_path = players_path.absolute()
+    return players_path.with_name(players_path.name + '.yaml-cache.jsonl')
+
+
+def load_folder(players_path: pathlib.Path, jobs: int = 1,
+                cache: Optional[YamlCache] = None) -> list[PlayerFile]:
+    """
+    Load all player YAMLs in a folder, sorted by file name.
+    With jobs > 1, files that are not in the cache are parsed in a process
+    pool. Raises ParseError (after logging it) if a file fails to parse.
+    """
+    if cache is None:
+        cache = YamlCache(None)
+
+    player_files: list[PlayerFile] = []
+    # Files with the same contents are only parsed once
+    to_parse: dict[str, tuple[list[PlayerFile], bytes]] = {}
+    for entry in sorted(os.scandir(players_path), key=lambda e: e.name):
+        if not entry.is_file():
+            continue
+        player_file = PlayerFile(path=pathlib.Path(entry.path))
+        player_files.append(player_file)
+        st = entry.stat()
+        digest = cache.known_digest(entry.path, st)
+        documents = None if digest is None else cache.lookup(digest)
+        if documents is None:
+            with open(entry.path, 'rb') as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            cache.remember_digest(entry.path, st, digest)
+            documents = cache.lookup(digest)
+        if documents is not None:
+            player_file.documents = documents
+        else:
+            to_parse.setdefault(digest, ([], data))[0].append(player_file)
+
+    def parsed(digest: str, documents: list[PlayerDocument]) -> None:
+        cache.store(digest, documents)
+        for player_file in to_parse[digest][0]:
+            player_file.documents = documents
+
+    if jobs > 1 and len(to_parse) > 1:
+        log.debug("Parsing %d player YAMLs using %d jobs", len(to_parse), jobs)
+        with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+            futures = {executor.submit(parse_yaml, data): digest
+                       for digest, (_, data) in to_parse.items()}
+            for future in concurrent.futures.as_completed(futures):
+                digest = futures[future]
+                try:
+                    parsed(digest, future.result())
+                except Exception as e:
+                    path = to_parse[digest][0][0].path
+                    log.exception(f"Failed to parse {path}")
+                    raise ParseError(path) from e
+    else:
+        for digest, (files, data) in to_parse.items():
+            try:
+                parsed(digest, parse_yaml(data))
+            except Exception as e:
+                log.exception(f"Failed to parse {files[0].path}")
+                raise ParseError(files[0].path) from e
+
+    return player_files
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr, level=logging.DEBUG)
+    import argparse
+    import pprint
+    parser = argparse.ArgumentParser()
+    parser.description = "Show what is extracted from the player YAMLs"
+
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="How many YAMLs to parse at the same time")
+    parser.add_argument("players", type=str,
+                        help="Player folder containing the YAMLs")
+
+    args = parser.parse_args()
+    pprint.pp(load_folder(pathlib.Path(args.players), args.jobs), width=200)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: CC0-1.0
+
+# Works out which locations of a multiworld should be reachable by now,
+# going through the spoiler spheres with the locations kept as columns.
+
+import enum
+import logging
+from collections.abc import Iterable, Iterator
+from typing import Optional
+
+import multiworld
+from multiworld import PlayerId
+
+
+log = logging.getLogger(__name__)
+
+
+class ItemClassification(enum.IntFlag):
+    filler = 0b00000
+    progression = 0b00001
+    useful = 0b00010
+    trap = 0b00100
+    skip_balancing = 0b01000
+    deprioritized = 0b10000
+    progression_deprioritized_skip_balancing = 0b11001
+    progression_skip_balancing = 0b01001
+    progression_deprioritized = 0b10001
+
+
+class _PlayerState:
+    """Per location bytes of one player, in the rows of its PlayerLocations"""
+
+    def __init__(self, player: PlayerId, columns: multiworld.PlayerLocations,
+                 progression_only: bool):
+        self.columns = columns
+        count = len(columns)
+        progression = int(ItemClassification.progression)
+        is_progression = bytearray(map(bool, map(progression.__and__,
+                                                 columns.flags)))
+        # Locations that are looked at at all
+        if progression_only:
+            self.selected = is_progression
+        else:
+            self.selected = bytearray(b'\x01' * count)
+        self.checked = bytearray(count)
+        # Whether the item blocks its owner until it is found: remote
+        # progression, since local items can just be picked up
+        self.blocking = bytearray(map(
+            bool, map(int.__and__, is_progression,
+                      map(player.__ne__, columns.item_players))))
+        self.rows: dict[int, list[int]] = {}  # Rows by sphere
+
+
+class Reachability:
+    """
+    Goes through the spheres of a multiworld and finds the locations that
+    aren't checked yet. Players are considered blocked from the sphere
+    after one in which some of their progression items weren't found yet,
+    if only guaranteed locations are wanted.
+    """
+
+    def __init__(self, mw: multiworld.MultiWorld,
+                 progression_only: bool = False):
+        self.mw = mw
+        table = mw.location_table
+        self.players: dict[PlayerId, _PlayerState] = {
+            player: _PlayerState(player, columns, progression_only)
+            for player, columns in table.players.items()
+        }
+        for sphere, sphere_locations in enumerate(mw.spheres, start=1):
+            for player, location_ids in sphere_locations.items():
+                state = self.players.get(player)
+                if state is None:
+                    continue
+                rows = [row
+                        for row in map(state.columns.index, location_ids)
+                        if row is not None]
+                rows.sort()
+                state.rows[sphere] = rows
+
+    @property
+    def sphere_count(self) -> int:
+        return len(self.mw.spheres)
+
+    @property
+    def unreachable_sphere(self) -> Optional[int]:
+        """
+        The sphere of unreachable locations, if there is one: Archipelago
+        only adds it after an empty sphere when some locations can't be
+        reached, so otherwise the last sphere is a normal one.
+        """
+        spheres = self.mw.spheres
+        if len(spheres) >= 2 and not any(spheres[-2].values()):
+            return len(spheres)
+        return None
+
+    def mark_checked(self, player: PlayerId,
+                     location_ids: Iterable[int]) -> None:
+        state = self.players.get(player)
+        if state is None:
+            return
+        for row in map(state.columns.index, location_ids):
+            if row is not None:
+                state.checked[row] = 1
+
+    def mark_checked_names(self, player: PlayerId,
+                           location_names: Iterable[str]) -> None:
+        """Like mark_checked, unknown location names are ignored"""
+        slot = self.mw.slot_info.get(player)
+        if slot is None or slot.game_name not in self.mw.datapackage:
+            return
+        name_to_id = self.mw.datapackage[slot.game_name] \
+            .get('location_name_to_id', {})
+        self.mark_checked(player, filter(None, map(name_to_id.get,
+                                                   location_names)))
+
+    def ignore_items(self, item_names: Iterable[str]) -> None:
+        """Don't let missing items with these names block anyone"""
+        item_names = set(item_names)
+        ignored_ids: dict[PlayerId, set[int]] = {}
+        for player, slot in self.mw.slot_info.items():
+            ignored_ids[player] = {
+                item_id
+                for item_id, name in self.mw.datapackage.item_names(
+                    slot.game_name).items()
+                if name in item_names}
+        for state in self.players.values():
+            columns = state.columns
+            for row, (item_id, item_player) in enumerate(
+                    zip(columns.item_ids, columns.item_players)):
+                if item_id in ignored_ids.get(item_player, ()):
+                    state.blocking[row] = 0
+
+    def unchecked_by_sphere(self, unreachable_sphere: Optional[int] = None,
+                            guaranteed_only: bool = False
+                            ) -> Iterator[tuple[int, dict[PlayerId, list[int]]]]:
+        """
+        Yield each sphere with the unchecked locations in it, by player.
+        Players that don't have any (or are blocked) aren't included.
+        The unreachable sphere (by default the last one, if the one before
+        it is empty) is skipped.
+        """
+        if unreachable_sphere is None:
+            unreachable_sphere = self.unreachable_sphere
+        blocked: set[PlayerId] = set()
+        for sphere in range(1, self.sphere_count + 1):
+            if sphere == unreachable_sphere:
+                continue
+            found: dict[PlayerId, list[int]] = {}
+            missing_after_sphere: set[PlayerId] = set()
+            for player, state in self.players.items():
+                rows = state.rows.get(sphere)
+                if not rows:
+                    continue
+                selected, checked = state.selected, state.checked
+                unchecked = [row for row in rows
+                             if selected[row] and not checked[row]]
+                if not unchecked:
+                    continue
+                if guaranteed_only:
+                    blocking, item_players = state.blocking, \
+                        state.columns.item_players
+                    missing_after_sphere.update(
+                        item_players[row] for row in unchecked
+                        if blocking[row])
+                    if player in blocked:
+                        continue
+                location_ids = state.columns.location_ids
+                found[player] = [location_ids[row] for row in unchecked]
+            yield sphere, found
+            blocked |= missing_after_sphere
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: CC0-1.0
+
+# Reads the rows out of a saved sphere tracker page of the Archipelago
+# webhost, bit by bit so huge pages don't have to be in memory at once.
+
+import dataclasses
+import html.parser
+import logging
+import sys
+from typing import Iterator, Optional, TextIO
+
+
+log = logging.getLogger(__name__)
+
+# Column headers (casefolded) that the fields are found by
+column_names = {
+    'sphere': ('sphere',),
+    'player': ('finder', 'player'),
+    'location': ('location',),
+}
+# Where the columns are if the table has no header
+default_columns = {'sphere': 0, 'player': 1, 'location': 4}
+
+
+@dataclasses.dataclass
+class SphereRow:
+    sphere: int
+    player: str  # Who finds the item, i.e. in whose world the location is
+    location: str
+
+
+class _TableParser(html.parser.HTMLParser):
+    """
+    Collects the text of the cells of every table row. Cells and rows that
+    aren't closed explicitly (which HTML allows) end at the next one.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        # Finished rows and whether they only consist of headers
+        self.rows: list[tuple[list[str], bool]] = []
+        self._row: Optional[list[str]] = None
+        self._row_is_header = True
+        self._cell: Optional[list[str]] = None
+
+    def _end_cell(self) -> None:
+        if self._cell is not None and self._row is not None:
+            self._row.append(''.join(self._cell).strip())
+        self._cell = None
+
+    def _end_row(self) -> None:
+        self._end_cell()
+        if self._row:
+            self.rows.append((self._row, self._row_is_header))
+        self._row = None
+
+    def handle_starttag(self, tag: str, attrs) -> None:
+        if tag == 'tr':
+            self._end_row()
+            self._row = []
+            self._row_is_header = True
+        elif tag in ('td', 'th') and self._row is not None:
+            self._end_cell()
+            self._cell = []
+            if tag == 'td':
+                self._row_is_header = False
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in ('td', 'th'):
+            self._end_cell()
+        elif tag in ('tr', 'table', 'thead', 'tbody'):
+            self._end_row()
+
+    def handle_data(self, data: str) -> None:
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def close(self) -> None:
+        super().close()
+        self._end_row()
+
+
+def _find_columns(header: list[str]) -> Optional[dict[str, int]]:
+    names = [name.casefold() for name in header]
+    columns = {}
+    for field, candidates in column_names.items():
+        for candidate in candidates:
+            if candidate in names:
+                columns[field] = names.index(candidate)
+                break
+        else:
+            return None  # Some other table
+    return columns
+
+
+def iter_rows(f: TextIO, chunk_size: int = 64 * 1024) -> Iterator[SphereRow]:
+    """
+    Yield the rows of the sphere table in the page read from f. Columns
+    are found by their headers, falling back to default_columns for
+    headers that aren't recognised. Rows that don't fit are skipped.
+    """
+    parser = _TableParser()
+    columns = default_columns
+    found = 0
+
+    def finished_rows() -> Iterator[SphereRow]:
+        nonlocal columns, found
+        for cells, is_header in parser.rows:
+            if is_header:
+                header_columns = _find_columns(cells)
+                if header_columns is None:
+                    log.warning("Unrecognised table header %r, assuming "
+                                "the default columns", cells)
+                    columns = default_columns
+                else:
+                    log.debug("Found table with columns %r: %r",
+                              cells, header_columns)
+                    columns = header_columns
+                continue
+            if len(cells) <= max(columns.values()):
+                continue
+            try:
+                sphere = int(cells[columns['sphere']])
+            except ValueError:
+                continue
+            found += 1
+            yield SphereRow(sphere=sphere,
+                            player=cells[columns['player']],
+                            location=cells[columns['location']])
+        parser.rows.clear()
+
+    while chunk := f.read(chunk_size):
+        parser.feed(chunk)
+        yield from finished_rows()
+    parser.close()
+    yield from finished_rows()
+    if found == 0:
+        log.warning("No sphere rows found, is this a sphere tracker page?")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr, level=logging.DEBUG)
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.description = "Show the rows of a saved sphere tracker page"
+
+    parser.add_argument("sphere_tracker", type=str,
+                        help="Path to the saved sphere tracker page")
+
+    args = parser.parse_args()
+    with open(args.sphere_tracker, 'rt', encoding='utf-8') as f:
+        for row in iter_rows(f):
+            print(row.sphere, row.player, row.location, sep='\t')
@@ -3,39 +3,427 @@
 # SPDX-License-Identifier: CC0-1.0
 
 import argparse
+import concurrent.futures
+import dataclasses
+import fastzip
 import json
 import logging
 import os
 import pathlib
+import player_yamls
 import sys
-import yaml
+import time
 import zipfile
-from typing import Any
+from collections.abc import Iterable
+from typing import Any, Iterator, Optional
 from apworlds import Database
 
 
 log = logging.getLogger(__name__)
-meta_root_options = {"meta_description"}
 really_keep = {"A Link to the Past"}
 
 
+def _manifest_names(stem: str) -> tuple[str, ...]:
+    # AP 0.6.6 does a walk, but that seems excessive.
+    return (f'{stem}/archipelago.json',
+            'archipelago.json')  # Common enough
+
+
+def _find_manifest_name(names: Iterable[str], stem: str) -> Optional[str]:
+    return next((ap_json_path
+                 for ap_json_path in _manifest_names(stem)
+                 if ap_json_path in names), None)
+
+
 def get_manifest(world_path: pathlib.Path) -> Any | None:
     if world_path.name.lower().endswith('.apworld'):
-        ap_json_path = f'{world_path.stem}/archipelago.json'
-        with zipfile.ZipFile(world_path) as world_zip:
-            # AP 0.6.6 does a walk, but that seems excessive.
-            if ap_json_path not in world_zip.namelist():
-                ap_json_path = 'archipelago.json'  # Common enough
-            if ap_json_path not in world_zip.namelist():
-                return None
-            with world_zip.open(ap_json_path) as f:
-                # TODO: Force UTF-8(-sig?) encoding
-                return json.load(f)
+        members = fastzip.read_members_any(world_path,
+                                           _manifest_names(world_path.stem))
+        ap_json_path = _find_manifest_name(members, world_path.stem)
+        if ap_json_path is None:
+            return None
+        # TODO: Force UTF-8(-sig?) encoding
+        return json.loads(members[ap_json_path])
     else:
         log.warning("Unsupported non-.apworld %s", world_path)
         return None
 
 
+@dataclasses.dataclass
+class ApworldInfo:
+    """What we found out by looking into an .apworld"""
+    game: Optional[str] = None
+    error: Optional[str] = None
+    manual_game: Optional[str] = None
+    manual_creator: Optional[str] = None
+    manual_error: Optional[str] = None
+    # The apworld couldn't be opened (e.g. locked), look again next time
+    retry: bool = False
+
+    @property
+    def manual_game_name(self) -> Optional[str]:
+        if self.manual_game is None or self.manual_creator is None:
+            return None
+        return f'Manual_{self.manual_game}_{self.manual_creator}'
+
+
+def _check_manifest(info: ApworldInfo, ap_json: Any) -> None:
+    if ap_json is None:
+        info.error = "does not have a archipelago.json manifest"
+    elif type(ap_json) is not dict:
+        info.error = "archipelago.json error: Root needs to be a dict"
+    elif 'game' not in ap_json:
+        info.error = "archipelago.json error: No 'game' found"
+    elif type(ap_json['game']) is not str:
+        info.error = "archipelago.json error: 'game' must be a string"
+    else:
+        info.game = ap_json['game']
+
+
+def _check_manual_game_json(info: ApworldInfo, game_json: Any) -> None:
+    if type(game_json) is not dict:
+        info.manual_error = "manual data/game.json error: Root needs to be a dict"
+    elif 'game' not in game_json:
+        info.manual_error = "manual data/game.json error: No 'game' found"
+    elif type(game_json['game']) is not str:
+        info.manual_error = "manual data/game.json error: 'game' must be a string"
+    elif 'player' not in game_json and 'creator' not in game_json:
+        info.manual_error = "manual data/game.json error: No 'creator' found"
+    else:
+        creator_key = 'creator' if 'creator' in game_json else 'player'
+        if type(game_json[creator_key]) is not str:
+            info.manual_error = f"manual data/game.json error: '{creator_key}' must be a string"
+        else:
+            info.manual_game = game_json['game']
+            info.manual_creator = game_json[creator_key]
+
+
+def inspect_apworld(world_path: pathlib.Path) -> ApworldInfo:
+    """
+    Look at the archipelago.json manifest and, for manuals, data/game.json.
+    """
+    info = ApworldInfo()
+    manual_game_json_path = f'{world_path.stem}/data/game.json'
+    names = _manifest_names(world_path.stem)
+    if world_path.name.lower().startswith('manual_'):
+        names += (manual_game_json_path,)
+    try:
+        members = fastzip.read_members_any(world_path, names)
+        ap_json_path = _find_manifest_name(members, world_path.stem)
+        # TODO: Force UTF-8(-sig?) encoding
+        _check_manifest(info, None if ap_json_path is None
+                        else json.loads(members[ap_json_path]))
+        if manual_game_json_path in members:
+            _check_manual_game_json(info,
+                                    json.loads(members[manual_game_json_path]))
+    except (zipfile.BadZipFile, ValueError) as e:
+        info.error = f"could not be read: {e}"
+    except OSError as e:
+        info.error = f"could not be opened: {e}"
+        info.retry = True
+    return info
+
+
+class ManifestCache:
+    """
+    Remembers what inspect_apworld found out across runs.
+    An entry is reused as long as the size and modification time of the
+    apworld match. Entries of apworlds that weren't looked at are dropped
+    when saving, but only those in folders that were scanned.
+    """
+
+    def __init__(self, path: Optional[pathlib.Path]):
+        self.path = path
+        self.entries: dict[str, dict[str, Any]] = {}  # By absolute path
+        self.used: set[str] = set()
+        self.scanned: set[str] = set()  # Folders, as absolute paths
+        self.dirty = False
+        if path is None:
+            return
+        try:
+            with open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.entries[entry['path']] = entry
+                    except (ValueError, KeyError, TypeError):
+                        self.dirty = True  # Rewrite without the broken line
+        except FileNotFoundError:
+            pass
+        except OSError:
+            log.warning("Failed to read manifest cache %s", path, exc_info=True)
+
+    def mark_scanned(self, folder: pathlib.Path) -> None:
+        """All apworlds of folder that are still there will be looked up"""
+        self.scanned.add(str(folder.absolute()))
+
+    def lookup(self, world_path: pathlib.Path,
+               st: os.stat_result) -> Optional[ApworldInfo]:
+        key = str(world_path.absolute())
+        self.used.add(key)
+        entry = self.entries.get(key)
+        if entry is not None \
+                and entry.get('size') == st.st_size \
+                and entry.get('mtime_ns') == st.st_mtime_ns:
+            try:
+                return ApworldInfo(**entry['info'])
+            except (KeyError, TypeError):
+                pass  # Outdated format, look again
+        return None
+
+    def store(self, world_path: pathlib.Path, st: os.stat_result,
+              info: ApworldInfo) -> None:
+        key = str(world_path.absolute())
+        self.used.add(key)
+        if info.retry:
+            return
+        self.entries[key] = {'path': key,
+                             'size': st.st_size,
+                             'mtime_ns': st.st_mtime_ns,
+                             'info': dataclasses.asdict(info)}
+        self.dirty = True
+
+    def get(self, world_path: pathlib.Path,
+            st: Optional[os.stat_result] = None) -> ApworldInfo:
+        if st is None:
+            st = world_path.stat()
+        info = self.lookup(world_path, st)
+        if info is None:
+            info = inspect_apworld(world_path)
+            self.store(world_path, st, info)
+        return info
+
+    def save(self) -> None:
+        for key in self.entries.keys() - self.used:
+            if os.path.dirname(key) in self.scanned:
+                del self.entries[key]
+                self.dirty = True
+        self.used = set()  # For the next run when watching
+        self.scanned = set()
+        if self.path is None or not self.dirty:
+            return
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        try:
+            with open(tmp_path, 'wt', encoding='utf-8') as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError:
+            log.warning("Failed to write manifest cache %s", self.path,
+                        exc_info=True)
+
+
+def default_cache_path(custom_worlds_path: pathlib.Path) -> pathlib.Path:
+    custom_worlds_path = custom_worlds_path.absolute()
+    return custom_worlds_path.with_name(custom_worlds_path.name
+                                        + '.strip-cache.jsonl')
+
+
+def default_db_snapshot_path(custom_worlds_path: pathlib.Path) -> pathlib.Path:
+    custom_worlds_path = custom_worlds_path.absolute()
+    return custom_worlds_path.with_name(custom_worlds_path.name
+                                        + '.strip-db.marshal')
+
+
+@dataclasses.dataclass
+class WorldVerdict:
+    """Whether an apworld is still needed and which game decided it"""
+    path: pathlib.Path
+    remove: bool = False
+    needed: bool = False  # Not just kept, but a wanted game was found
+    game: Optional[str] = None
+    source: Optional[str] = None  # 'database', 'manifest' or 'manual'
+
+
+def iter_apworlds(folder: pathlib.Path) -> Iterator[os.DirEntry]:
+    with os.scandir(folder) as it:
+        for entry in it:
+            if entry.name.lower().endswith('.apworld') and entry.is_file():
+                yield entry
+
+
+def decide_world(world_path: pathlib.Path, games: set[str], db: Database,
+                 info: Optional[ApworldInfo]) -> WorldVerdict:
+    """
+    Decide whether an apworld can go, using the database if it knows the
+    apworld and otherwise what inspect_apworld found out (info).
+    """
+    verdict = WorldVerdict(path=world_path)
+    db_game = db.game_for_file(world_path.stem)
+    if db_game is not None:
+        verdict.game = db_game
+        verdict.source = 'database'
+        verdict.needed = verdict.game in games
+        verdict.remove = not verdict.needed
+    elif info is not None:
+        if info.game is None:
+            log.warning("%s %s", world_path, info.error)
+        else:
+            verdict.game = info.game
+            verdict.source = 'manifest'
+            verdict.needed = verdict.game in games
+            verdict.remove = not verdict.needed
+
+        # Look into manuals, they have a game.json we can use for now
+        if not verdict.remove \
+                and world_path.name.lower().startswith('manual_'):
+            if info.manual_error is not None:
+                log.warning(f"{world_path} {info.manual_error}")
+            elif info.manual_game_name is not None:
+                verdict.game = info.manual_game_name
+                verdict.source = 'manual'
+                if info.manual_game == "Stable" \
+                        or info.manual_game == "Unstable":
+                    log.debug("Keeping %r because the manual client is ugh",
+                              verdict.game)
+                    verdict.needed = True
+                else:
+                    verdict.needed = verdict.game in games
+                    verdict.remove = not verdict.needed
+
+    if verdict.remove and (db.should_keep_game(verdict.game)
+                           or db.should_keep_file(world_path.stem)):
+        log.debug("Database wants to keep %r (%r)", world_path, verdict.game)
+        verdict.remove = False
+    return verdict
+
+
+def classify_worlds(custom_worlds_path: pathlib.Path, games: set[str],
+                    db: Database, cache: ManifestCache,
+                    jobs: int = 1) -> list[WorldVerdict]:
+    """
+    Walk the custom_worlds folder once and decide for every apworld whether
+    it is still needed, opening each apworld at most once.
+    With jobs > 1, apworlds not in the cache are inspected in parallel.
+    Verdicts are sorted by file name regardless.
+    """
+    infos: dict[pathlib.Path, Optional[ApworldInfo]] = {}
+    to_inspect: dict[pathlib.Path, os.stat_result] = {}
+    cache.mark_scanned(custom_worlds_path)
+    for entry in iter_apworlds(custom_worlds_path):
+        world_path = pathlib.Path(entry.path)
+        infos[world_path] = None
+        if db.find_by_file(world_path.stem) is not None:
+            continue
+        try:
+            st = entry.stat()
+        except OSError as e:
+            log.warning("Skipping %s: %s", world_path, e)
+            del infos[world_path]
+            continue
+        infos[world_path] = cache.lookup(world_path, st)
+        if infos[world_path] is None:
+            to_inspect[world_path] = st
+
+    if jobs > 1 and len(to_inspect) > 1:
+        log.debug("Inspecting %d apworlds using %d jobs", len(to_inspect), jobs)
+        with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+            futures = {executor.submit(inspect_apworld, world_path): world_path
+                       for world_path in to_inspect.keys()}
+            for future in concurrent.futures.as_completed(futures):
+                world_path = futures[future]
+                infos[world_path] = future.result()
+                log.debug("Inspected %s: %r", world_path, infos[world_path])
+    else:
+        for world_path in to_inspect.keys():
+            infos[world_path] = inspect_apworld(world_path)
+    for world_path, st in to_inspect.items():
+        cache.store(world_path, st, infos[world_path])
+
+    return [decide_world(world_path, games, db, infos[world_path])
+            for world_path in sorted(infos.keys())]
+
+
+def games_from_players(player_files: list[player_yamls.PlayerFile]) -> set[str]:
+    games = set()
+    for player_file in player_files:
+        child = player_file.path
+        for doc in player_file.documents:
+            i = doc.index
+            if doc.game_type is not None:
+                log.warning(f"{child} #{i + 1} unknown 'game' {doc.game_type}")
+            elif doc.has_game:
+                games.update(doc.games)
+                log.debug("%s #%i: Found %r", child, i, doc.games)
+            elif not doc.is_meta:
+                log.warning(f"{child} #{i + 1} does not have 'game'")
+            if doc.is_meta:
+                log.info(f"Found meta file {child} #{i + 1}")
+                games.update(doc.meta_categories)
+                log.debug("%s #%i (meta): Found %r", child, i,
+                          doc.meta_categories)
+    return games
+
+
+def remove_worlds(verdicts: list[WorldVerdict],
+                  move_to_path: Optional[pathlib.Path],
+                  dryrun: bool) -> None:
+    for verdict in verdicts:
+        if not verdict.remove:
+            continue
+        world_path = verdict.path
+        if move_to_path is not None:
+            log.debug("Moving %s", world_path)
+        else:
+            log.debug("Removing %s", world_path)
+        if not dryrun:
+            try:
+                if move_to_path is not None:
+                    if hasattr(world_path, 'move_into'):  # Python 3.14+
+                        world_path.move_into(move_to_path)
+                    else:
+                        os.replace(world_path, move_to_path / world_path.name)
+                else:
+                    world_path.unlink()
+            except:
+                log.exception("Failed to (re)move %s", world_path)
+
+
+def restore_worlds(verdicts: list[WorldVerdict],
+                   custom_worlds_path: pathlib.Path,
+                   dryrun: bool) -> None:
+    """Move apworlds of wanted games back into custom_worlds"""
+    to_restore: list[tuple[WorldVerdict, pathlib.Path]] = []
+    for verdict in verdicts:
+        if not verdict.needed:
+            continue
+        target_path = custom_worlds_path / verdict.path.name
+        if target_path.exists():
+            log.warning("Not restoring %s because %s already exists",
+                        verdict.path, target_path)
+            continue
+        to_restore.append((verdict, target_path))
+
+    if to_restore:
+        log.info("Restoring %d apworlds", len(to_restore))
+    for verdict, target_path in to_restore:
+        log.debug("Restoring %s (%r)", verdict.path, verdict.game)
+        if not dryrun:
+            try:
+                os.replace(verdict.path, target_path)
+            except:
+                log.exception("Failed to restore %s", verdict.path)
+
+
+def _folder_state(*folders: Optional[pathlib.Path]) -> dict[str, tuple[int, int]]:
+    state = {}
+    for folder in folders:
+        if folder is None:
+            continue
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue  # Removed in the meantime
+                    state[entry.path] = (st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            pass
+    return state
+
+
 def main() -> int:
     parser = argparse.ArgumentParser()
     parser.description = "Remove apworlds that don't appear in the player yamls."
@@ -52,198 +440,147 @@ def main() -> int:
                         help="Which APWorlds to not strip, comma separated game list")
     parser.add_argument("--move-to", type=str, default=None, dest='moveto',
                         help="Move stripped apworlds to directory instead of deleting them")
+    parser.add_argument("--cache", type=str, default=None,
+                        help="Where to cache apworld manifests "
+                        "(default: next to the custom_worlds folder)")
+    parser.add_argument("--no-cache", action='store_true', default=False,
+                        dest='nocache',
+                        help="Don't use or write the manifest, database and YAML caches")
+    parser.add_argument("--db-snapshot", type=str, default=None,
+                        dest='db_snapshot',
+                        help="Where to keep the compiled database snapshot "
+                        "(default: next to the custom_worlds folder)")
+    parser.add_argument("--yaml-cache", type=str, default=None,
+                        dest='yaml_cache',
+                        help="Where to cache what was found in the player YAMLs "
+                        "(default: next to the players folder)")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="How many apworlds and YAMLs to look into at the same time")
+    parser.add_argument("--restore-from", type=str, default=None,
+                        dest='restore_from',
+                        help="Instead of stripping, move apworlds of games in "
+                        "the player yamls back from this directory")
+    parser.add_argument("--watch", action='store_true', default=False,
+                        help="Keep running and update whenever the player YAMLs "
+                        "or apworlds change, restoring apworlds from --move-to")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="How many seconds to wait between checking for "
+                        "changes with --watch")
     parser.add_argument("players", type=str, help="Player folder containing the YAMLs")
     parser.add_argument("custom_worlds", type=str, help="custom_worlds folder to strip")
 
     args = parser.parse_args()
+    if args.watch and args.restore_from is not None:
+        parser.error("--watch restores from --move-to, "
+                     "--restore-from can't be used with it")
 
     if args.dryrun:
         log.info("This is a dry run, no modifications will be made.")
 
-    games = set()
+    base_games = set()
     if args.keep is not None:
-        games |= map(str.strip, args.keep.split(','))
-    log.debug("Games to keep (cli): %r", games)
-    games |= really_keep
+        base_games.update(map(str.strip, args.keep.split(',')))
+    log.debug("Games to keep (cli): %r", base_games)
+    base_games |= really_keep
     log.debug("Games to really keep (built-in): %r", really_keep)
 
-    db = Database()
-
+    db_paths = []
     if args.database is None:
         script_dir = pathlib.Path(__file__).absolute().parent
-        try:
-            db.insert_file(script_dir / "apworlds.csv")
-        except FileNotFoundError:
-            pass  # Only error when it was specified
+        if (script_dir / "apworlds.csv").exists():
+            db_paths.append(script_dir / "apworlds.csv")
+        # Only error when it was specified
     else:
-        db.insert_file(pathlib.Path(args.database))
-
-    for extra_db_path in args.add_database:
-        db.insert_file(pathlib.Path(extra_db_path))
-
-    db_keep_game = {entry.game_name
-                    for entry in db.entries
-                    if entry.keep and entry.game_name != ""}
-    db_keep_file = {entry.game_name
-                    for entry in db.entries
-                    if entry.keep and entry.file_name != ""}
-    log.debug("Games to keep (DB): %r", db_keep_game)
-    games |= db_keep_game
-    del db_keep_game
-
-    db_games: dict[str, str] = {entry.file_name: entry.game_name
-                                for entry in db.entries}
-
-    for child in pathlib.Path(args.players).iterdir():
-        if not child.is_file():
-            continue
-        try:
-            with open(child, 'rt', encoding='utf-8-sig') as f:
-                inp = list(yaml.safe_load_all(f.read()))
-        except:
-            log.exception(f"Failed to parse {child}")
-            return 1
-        for i, content in enumerate(inp):
-            if 'game' in content:
-                if type(content['game']) is str:
-                    games.add(content['game'])
-                    log.debug("%s #%i: Found ['%s']", child, i, content['game'])
-                elif type(content['game']) is dict:
-                    games.update(content['game'].keys())
-                    log.debug("%s #%i: Found %r", child, i,
-                              list(content['game'].keys()))
-                else:
-                    log.warning(f"{child} #{i + 1} unknown 'game' {type(game)}")
-                    log.debug(f"{child} #{i + 1} unknown 'game' was %r", game)
-            elif 'meta_description' not in content:
-                info.warning(f"{child} #{i + 1} does not have 'game'")
-            if 'meta_description' in content:
-                log.info(f"Found meta file {child} #{i + 1}")
-                games.update((category
-                              for category in content.keys()
-                              if category not in meta_root_options))
-                log.debug("%s #%i (meta): Found ['%s']", child, i,
-                          list(category
-                               for category in content.keys()
-                               if category not in meta_root_options))
-
-    log.debug("Games to keep: %s", games)
-
-    custom_worlds_path = pathlib.Path(args.custom_worlds)
+        db_paths.append(pathlib.Path(args.database))
+    db_paths.extend(map(pathlib.Path, args.add_database))
 
-    apworlds_to_remove: dict[pathlib.Path, str] = dict() # path stem: game name
+    if args.nocache:
+        db_snapshot_path = None
+    elif args.db_snapshot is not None:
+        db_snapshot_path = pathlib.Path(args.db_snapshot)
+    else:
+        db_snapshot_path = default_db_snapshot_path(
+            pathlib.Path(args.custom_worlds))
+    db = Database.from_files(db_paths, db_snapshot_path)
 
-    # Remove via database
-    for world_path in custom_worlds_path.iterdir():
-        if not world_path.is_file() \
-                or not world_path.name.lower().endswith('.apworld') \
-                or world_path in apworlds_to_remove.keys() \
-                or world_path.stem not in db_games.keys():
-            continue
-        game = db_games[world_path.stem]
-        if game not in games:
-            apworlds_to_remove[world_path] = game
-
-    # Look into remaining apworlds and check their archipelago.json manifest
-    for world_path in custom_worlds_path.iterdir():
-        if not world_path.is_file() \
-                or not world_path.name.lower().endswith('.apworld') \
-                or world_path in apworlds_to_remove.keys() \
-                or world_path.stem in db_games.keys():
-            continue
-        ap_json = get_manifest(world_path)
-        if ap_json is None:
-            log.warning("%s does not have a archipelago.json manifest", world_path)
-            continue
-        if type(ap_json) is not dict:
-            log.warning("%s archipelago.json error: Root needs to be a dict", world_path)
-            continue
-        if 'game' not in ap_json:
-            log.warning("%s archipelago.json error: No 'game' found", world_path)
-            continue
-        game = ap_json['game']
-        if type(game) is not str:
-            log.warning("%s archipelago.json error: 'game' must be a string", world_path)
-            continue
-        if game not in games:
-            apworlds_to_remove[world_path] = game
-
-    # Look into manuals, they have a game.json we can use for now
-    for world_path in custom_worlds_path.iterdir():
-        if not world_path.is_file() \
-                or not world_path.name.lower().startswith('manual_') \
-                or not world_path.name.lower().endswith('.apworld') \
-                or world_path in apworlds_to_remove.keys() \
-                or world_path.stem in db_games.keys():
-            continue
-        manual_game_json_path = f'{world_path.stem}/data/game.json'
-        with zipfile.ZipFile(world_path) as world_zip:
-            if manual_game_json_path not in world_zip.namelist():
-                continue
-            with world_zip.open(manual_game_json_path) as f:
-                # TODO: Force UTF-8(-sig?) encoding
-                game_json = json.load(f)
-        if type(game_json) is not dict:
-            log.warning(f"{world_path} manual data/game.json error: Root needs to be a dict")
-            continue
-        if 'game' not in game_json:
-            log.warning(f"{world_path} manual data/game.json error: No 'game' found")
-            continue
-        game_name = game_json['game']
-        if type(game_name) is not str:
-            log.warning(f"{world_path} manual data/game.json error: 'game' must be a string")
-            continue
-        if 'player' not in game_json and 'creator' not in game_json:
-            log.warning(f"{world_path} manual data/game.json error: No 'creator' found")
-            continue
-        if 'creator' in game_json:
-            creator_name = game_json['creator']
-            if type(creator_name) is not str:
-                log.warning(f"{world_path} manual data/game.json error: 'creator' must be a string")
-                continue
-        else:
-            creator_name = game_json['player']
-            if type(creator_name) is not str:
-                log.warning(f"{world_path} manual data/game.json error: 'player' must be a string")
-                continue
-        game = f'Manual_{game_name}_{creator_name}'
-        if game_name == "Stable" or game_name == "Unstable":
-            log.debug("Keeping %r because the manual client is ugh", game)
-            continue  # Keep the official client
-        if game not in games:
-            apworlds_to_remove[world_path] = game
-
-    for world_path, game_name in list(apworlds_to_remove.items()):
-        if db.should_keep_game(game_name) \
-                or db.should_keep_file(world_path.stem):
-            log.debug("Database wants to keep %r (%r)", world_path, game_name)
-            del apworlds_to_remove[world_path]
+    log.debug("Games to keep (DB): %r", db.keep_games)
+    base_games |= db.keep_games
 
+    players_path = pathlib.Path(args.players)
+    custom_worlds_path = pathlib.Path(args.custom_worlds)
     if args.moveto:
         move_to_path = pathlib.Path(args.moveto)
     else:
         move_to_path = None
 
-    for world_path in apworlds_to_remove.keys():
-        if move_to_path is not None:
-            log.debug("Moving %s", world_path)
+    if args.nocache:
+        yaml_cache = player_yamls.YamlCache(None)
+        cache = ManifestCache(None)
+    else:
+        yaml_cache = player_yamls.YamlCache(
+            pathlib.Path(args.yaml_cache) if args.yaml_cache is not None
+            else player_yamls.default_cache_path(players_path))
+        cache = ManifestCache(
+            pathlib.Path(args.cache) if args.cache is not None
+            else default_cache_path(custom_worlds_path))
+
+    def run(strip: bool, restore_path: Optional[pathlib.Path]) -> int:
+        try:
+            player_files = player_yamls.load_folder(players_path, args.jobs,
+                                                    yaml_cache)
+        except player_yamls.ParseError:
+            return 1
+        yaml_cache.save()
+
+        games = base_games | games_from_players(player_files)
+        log.debug("Games to keep: %s", games)
+
+        if strip:
+            verdicts = classify_worlds(custom_worlds_path, games, db, cache,
+                                       args.jobs)
         else:
-            log.debug("Removing %s", world_path)
-        if not args.dryrun:
-            try:
-                if move_to_path is not None:
-                    if hasattr(world_path, 'move_into'):  # Python 3.14+
-                        world_path.move_into(move_to_path)
-                    else:
-                        os.replace(world_path, move_to_path / world_path.name)
-                else:
-                    world_path.unlink()
-            except:
-                log.exception("Failed to (re)move %s", world_path)
+            verdicts = []
+        if restore_path is not None:
+            restore_verdicts = classify_worlds(restore_path, games, db, cache,
+                                               args.jobs)
+        else:
+            restore_verdicts = []
+        cache.save()
 
-    if args.dryrun:
-        log.info("This was a dry run, no modifications has been made.")
+        remove_worlds(verdicts, move_to_path, args.dryrun)
+        restore_worlds(restore_verdicts, custom_worlds_path, args.dryrun)
+        return 0
+
+    if not args.watch:
+        if args.restore_from is not None:
+            ret = run(False, pathlib.Path(args.restore_from))
+        else:
+            ret = run(True, None)
+        if args.dryrun:
+            log.info("This was a dry run, no modifications has been made.")
+        return ret
 
+    if move_to_path is None:
+        log.warning("Without --move-to, removed apworlds can't be brought back")
+    log.info("Watching %s and %s, press Ctrl+C to stop",
+             players_path, custom_worlds_path)
+    state = None
+    try:
+        while True:
+            new_state = _folder_state(players_path, custom_worlds_path,
+                                      move_to_path)
+            if new_state != state:
+                log.info("Change detected, updating")
+                try:
+                    run(True, move_to_path)
+                except Exception:
+                    log.exception("Updating failed")
+                # Don't react to our own changes
+                state = _folder_state(players_path, custom_worlds_path,
+                                      move_to_path)
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
     return 0
 
 
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: CC0-1.0
+
+# Regression checks for reading checked locations, run with
+# python -m unittest test_location_checks
+
+import collections
+import os
+import pickle
+import tempfile
+import unittest
+import zlib
+
+import location_checks
+
+
+class LoadApsaveTest(unittest.TestCase):
+    def write_apsave(self, data) -> str:
+        with tempfile.NamedTemporaryFile(suffix='.apsave',
+                                         delete=False) as f:
+            f.write(zlib.compress(pickle.dumps(data)))
+        self.addCleanup(os.remove, f.name)
+        return f.name
+
+    def test_defaultdict(self):
+        # The server keeps location_checks in a defaultdict(set)
+        path = self.write_apsave({'location_checks': collections.defaultdict(
+            set, {(0, 1): {1001, 1002}, (0, 2): set(), (1, 1): {1003}})})
+        self.assertEqual(location_checks.load_apsave(path),
+                         {1: {1001, 1002}, 2: set()})
+        self.assertEqual(location_checks.load_apsave(path, team=1),
+                         {1: {1003}})
+
+    def test_no_location_checks(self):
+        path = self.write_apsave({'hints': {}})
+        with self.assertRaises(ValueError):
+            location_checks.load_apsave(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,11 +6,13 @@
 # instances of real classes, but rather instances of "Unpickled" that can
 # be later resolved to real objects.
 
+import contextlib
 import functools
 import logging
+import operator
 import pickle
 import sys
-from typing import Any, Union, Callable, Optional
+from typing import Any, Union, Callable, ContextManager, Iterator, Optional
 
 
 log = logging.getLogger(__name__)
@@ -20,28 +22,45 @@
 Origin = Union[OriginName, 'Unpickled', None]
 
 
+_no_kwargs: dict[Any, Any] = {}  # Shared, never modify
+
+
 class Unpickled:
+    __slots__ = ('args', 'kwargs', 'state')
     origin: Origin = None
-    args: list[Any]
+    args: tuple[Any, ...]
     kwargs: dict[Any, Any]
+    state: Any  # What pickle would pass to __setstate__, if anything
 
-    def __init__(self, *args, **kwargs):
-        self.args = args
-        self.kwargs = kwargs
-
-    # For some reason this is needed, otherwise __init__ won't be called?
     def __new__(cls, *args, **kwargs):
+        # Only __new__, since pickle calls just that for NEWOBJ
         o = object.__new__(cls)
-        o.__init__(*args, **kwargs)
+        o.args = args
+        # Almost always empty, so share one instead of keeping millions
+        o.kwargs = kwargs if kwargs else _no_kwargs
+        o.state = None
         return o
 
+    def __setstate__(self, state: Any) -> None:
+        self.state = state
+
     def __str__(self) -> str:
         return f"Unpickled(origin={self.origin}, " \
-            f"args={self.args}, kwargs={self.kwargs})"
+            f"args={self.args}, kwargs={self.kwargs}" \
+            + ("" if self.state is None else f", state={self.state}") + ")"
 
     def __repr__(self) -> str:
         return f"Unpickled(origin={repr(self.origin)}, " \
-            f"args={repr(self.args)}, kwargs={repr(self.kwargs)})"
+            f"args={repr(self.args)}, kwargs={repr(self.kwargs)}" \
+            + ("" if self.state is None else f", state={repr(self.state)}") \
+            + ")"
+
+    def __reduce__(self) -> tuple:
+        # The generated subclasses can't be found by name, so recreate them
+        if type(self.origin) is not tuple:
+            raise pickle.PicklingError(
+                f"Can't pickle Unpickled with origin {self.origin!r}")
+        return (_restore, (*self.origin, self.args, self.kwargs, self.state))
 
     # TODO: More testing whenever this is actually used (RESOLVE opcode)
     # def __call__(self, *args, **kwargs) -> 'Unpickled':
@@ -50,61 +69,207 @@ def __repr__(self) -> str:
     #     return o
 
 
+@functools.cache
 def _create_global(module: str, name: str) -> type[Unpickled]:
+    # Shared by all Unpicklers, there's nothing specific to one in them
     return type(f'Unpickled_{module}_{name}', (Unpickled,), {
-        'origin': (module, name)
+        '__slots__': (),
+        'origin': (module, name),
+    })
+
+
+def _restore(module: str, name: str, args: tuple[Any, ...],
+             kwargs: dict[Any, Any], state: Any) -> Unpickled:
+    """Counterpart to Unpickled.__reduce__"""
+    o = _create_global(module, name)(*args, **kwargs)
+    o.state = state
+    return o
+
+
+ResolveMappingCallback = Callable[..., Any]
+ResolveMappingFallbackCallback = Callable[
+    [Union[tuple[str, str], Unpickled, None],
+     list[Any], dict[Any, Any]], Any]
+ResolveMapping = dict[tuple[str, str], ResolveMappingCallback]
+
+
+def _create_constructor(module: str, name: str,
+                        func: Callable[..., Any]) -> type:
+    """
+    A class that returns func(*args, **kwargs) instead of an instance of
+    itself, since pickle wants a class for some opcodes (NEWOBJ).
+    """
+    def __new__(cls, *args, **kwargs):
+        return func(*args, **kwargs)
+    return type(f'Resolving_{module}_{name}', (), {
+        'origin': (module, name),
+        '__new__': __new__,
     })
 
 
 class Unpickler(pickle.Unpickler):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.__cached_globals: dict[OriginName, type[Unpickled]] = {}
+    """
+    With a mapping (and fallback), objects are resolved like resolve() does
+    while loading, so no Unpickled is created for them at all. Classes that
+    are neither in the mapping nor handled by a fallback still become
+    Unpickled.
+    pickle applies the state of an object (BUILD) to whatever the mapping
+    returned if that takes it (has a __dict__ or __setstate__), while
+    resolve() ignores it. If the object can't take it, loading fails and,
+    if the file can be opened again (reopen, or by seeking back), it is
+    loaded without the mapping and resolved afterwards.
+    """
+
+    def __init__(self, file: Any, *args,
+                 mapping: Optional[ResolveMapping] = None,
+                 fallback: Optional[ResolveMappingFallbackCallback] = None,
+                 reopen: Optional[Callable[[], ContextManager[Any]]] = None,
+                 **kwargs):
+        super().__init__(file, *args, **kwargs)
+        self.__cached_globals: dict[OriginName, type] = {}
+        self.__mapping = mapping if mapping is not None else {}
+        self.__fallback = fallback
+        if reopen is None and _seekable(file):
+            reopen = functools.partial(_rewound, file, file.tell())
+        self.__reopen = reopen
+        self.__args = args
+        self.__kwargs = kwargs
 
     def find_class(self, module: str, name: str):
         combined = (module, name)
         if combined not in self.__cached_globals:
-            self.__cached_globals[combined] = _create_global(module, name)
+            self.__cached_globals[combined] = self.__create_global(module,
+                                                                   name)
         return self.__cached_globals[combined]
 
+    def __create_global(self, module: str, name: str) -> type:
+        combined = (module, name)
+        if combined in self.__mapping:
+            return _create_constructor(module, name, self.__mapping[combined])
+        fallback = self.__fallback
+        if fallback is not None:
+            return _create_constructor(
+                module, name,
+                lambda *args, **kwargs: fallback(combined, args, kwargs))
+        return _create_global(module, name)
 
-ResolveMappingCallback = Callable[..., Any]
-ResolveMappingFallbackCallback = Callable[
-    [Union[tuple[str, str], Unpickled, None],
-     list[Any], dict[Any, Any]], Any]
-ResolveMapping = dict[tuple[str, str], ResolveMappingCallback]
+    def load(self) -> Any:
+        try:
+            return super().load()
+        except (AttributeError, TypeError, pickle.UnpicklingError):
+            if self.__reopen is None \
+                    or (not self.__mapping and self.__fallback is None):
+                raise
+            log.debug("Loading again without the mapping", exc_info=True)
+        with self.__reopen() as f:
+            data = Unpickler(f, *self.__args, **self.__kwargs).load()
+        return resolve(data, self.__mapping, self.__fallback)
+
+
+def _seekable(f: Any) -> bool:
+    try:
+        return f.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+
+@contextlib.contextmanager
+def _rewound(f: Any, position: int) -> Iterator[Any]:
+    f.seek(position)
+    yield f
 
 
-def _resolve(mapping: ResolveMapping,
-             fallback: Optional[ResolveMappingFallbackCallback],
-             o: Any) -> Any:
-    resolve = functools.partial(_resolve, mapping, fallback)
+_atomic_types = (int, str, bool, float, type(None))
+_atomic_type_set = frozenset(_atomic_types)
+_container_types = (list, tuple, set, frozenset, dict)
+
+
+def _children(o: Any) -> tuple:
+    """What needs to be resolved before o can be"""
+    if type(o) is dict:
+        return (*o.keys(), *o.values())
+    elif isinstance(o, Unpickled):
+        return (o.args, o.kwargs)
+    return tuple(o)
+
+
+def _build(mapping: ResolveMapping,
+           fallback: Optional[ResolveMappingFallbackCallback],
+           o: Any, resolved: list[Any]) -> Any:
+    """Create the resolved version of o out of its resolved children"""
     if isinstance(o, Unpickled):
+        args, kwargs = resolved
         if o.origin is None or o.origin not in mapping:
             if fallback is not None:
-                return fallback(o.origin, resolve(o.args), resolve(o.kwargs))
-        return mapping[o.origin](*resolve(o.args), **resolve(o.kwargs))
-    elif type(o) is list:
-        return list(map(resolve, o))
-    elif type(o) is tuple:
-        return tuple(map(resolve, o))
-    elif type(o) is set:
-        return set(map(resolve, o))
-    elif type(o) is frozenset:
-        return frozenset(map(resolve, o))
-    elif type(o) is dict:
-        return dict(map(resolve, o.items()))
-    elif isinstance(o, (int, str, bool, float)) or o is None:
-        return o
-    else:
-        logging.warning(f"Unhandled: {type(o)}")
-        return o
+                return fallback(o.origin, args, kwargs)
+        return mapping[o.origin](*args, **kwargs)
+    if type(o) is dict:
+        count = len(o)
+        return dict(zip(resolved[:count], resolved[count:]))
+    return type(o)(resolved)
 
 
 def resolve(o: Any, mapping: ResolveMapping,
             fallback: Optional[ResolveMappingFallbackCallback] = None) -> Any:
-    # TODO: Currently shared objects won't be shared
-    return _resolve(mapping, fallback, o)
+    """
+    Replace every Unpickled in o by what mapping (or fallback) returns for
+    it. Objects referenced from multiple places are only resolved once and
+    stay shared, and containers are only copied when something inside them
+    changed. Doesn't recurse, so deeply nested data is fine.
+    Lists and dicts that contain themselves are always copied, other cycles
+    (only possible through them) keep the unresolved object at the point
+    where the cycle closes.
+    """
+    if isinstance(o, _atomic_types):
+        return o
+    memo: dict[int, Any] = {}  # id of original -> resolved object
+    pending: set[int] = set()  # Waiting for their children
+    stack: list[tuple[Any, bool]] = [(o, False)]
+    while stack:
+        current, children_done = stack.pop()
+        current_id = id(current)
+        if children_done:
+            pending.discard(current_id)
+            children = _children(current)
+            resolved = [memo.get(id(child), child) for child in children]
+            if current_id in memo:
+                # Already handed out because of a cycle, fill it in now
+                created = memo[current_id]
+                if type(created) is dict:
+                    created.update(_build(mapping, fallback, current, resolved))
+                else:
+                    created.extend(resolved)
+            elif not isinstance(current, Unpickled) and all(
+                    map(operator.is_, resolved, children)):
+                memo[current_id] = current
+            else:
+                memo[current_id] = _build(mapping, fallback, current, resolved)
+            continue
+
+        if current_id in memo:
+            continue
+        if current_id in pending:
+            # current contains itself somewhere
+            if type(current) in (list, dict):
+                memo[current_id] = type(current)()
+            continue
+        if type(current) in _container_types:
+            children = _children(current)
+            if _atomic_type_set.issuperset(map(type, children)):
+                continue  # Nothing inside to resolve, stays as it is
+        elif isinstance(current, Unpickled):
+            children = _children(current)
+        else:
+            if not isinstance(current, _atomic_types):
+                log.warning(f"Unhandled: {type(current)}")
+            continue
+        pending.add(current_id)
+        stack.append((current, True))
+        stack.extend((child, False)
+                     for child in children
+                     if type(child) not in _atomic_type_set)
+
+    return memo.get(id(o), o)
 
 
 if __name__ == '__main__':
@@ -16,6 +16,11 @@
 
 log = logging.getLogger(__name__)
 
+# What is kept of the multiworld for the message, the rest (e.g. the
+# locations and slot data) can be huge for big multiworlds.
+mw_fields = {'server_options', 'slot_info', 'connect_names', 'version',
+             'seed_name', 'race_mode'}
+
 http_headers = {
     'User-Agent': "ap-upload/0.1 (https://github.com/Neui/ap-misc)",
 }
@@ -84,6 +89,9 @@ def main() -> int:
                         help="Where to find secrets file")
     parser.add_argument("--config", type=str, default="upload.yaml",
                         help="Configuration file")
+    parser.add_argument("--cache-dir", type=str, default=None,
+                        dest='cache_dir',
+                        help="Directory to cache parsed multiworlds in")
     parser.add_argument("multiworld", type=str,
                         help="Generated multiworld zip to upload")
 
@@ -125,15 +133,19 @@ def main() -> int:
             log.debug("Loading session status code: %r", r.status)
 
     log.info("Loading multiworld data")
-    with open(args.multiworld, 'rb') as mw_file:
-        multiworld_data = mw_file.read()
-
     try:
-        apdata = multiworld.parse(multiworld_data)
+        cache = None
+        if args.cache_dir is not None:
+            cache = multiworld.ParseCache(args.cache_dir)
+        apdata = multiworld.parse(args.multiworld, fields=mw_fields,
+                                  cache=cache)
     except:
         logging.exception("Failed to parse multiworld data")
         apdata = multiworld.MultiWorld()
 
+    with open(args.multiworld, 'rb') as mw_file:
+        multiworld_data = mw_file.read()
+
     log.info("Uploading multiworld")
     content_type, mwdata = generate_multipart_file(
         multiworld_data,
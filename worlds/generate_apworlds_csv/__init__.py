@@ -26,6 +26,7 @@ def run_generate_apworlds(*args) -> None:
         if database_file is None:
             return
 
+    # No snapshot, it would be outdated by the output below every time
     try:
         db.insert_file(database_file)
     except FileNotFoundError: